@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Runs the sentence compression ablations of condor_D4_tests in one process. Documents are retrieved
+once, each clean sentence is parsed by spaCy once and shared by every combination of remove_* flags,
+and selection, ordering, writing and ROUGE run for each combination."""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import argparse
+
+import data_input
+from data_input import configure_class_objects, get_raw_topics, get_categories, iter_topic_attributes, build_topic
+from text_summarizer import summarize_topics_batch
+from info_ordering import build_entity_model
+from evaluation import eval_summary
+
+#### remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl of each condor_D4_tests job
+default_combinations = ["0_0_0_0_0_0_0", "1_0_0_0_0_0_0", "1_1_0_0_0_0_0", "1_1_1_0_0_0_0",
+                        "1_1_1_1_0_0_0", "1_1_1_1_1_0_0", "1_1_1_1_1_1_0", "1_1_1_1_1_1_1"]
+
+
+# Turns a combination like "1_1_0_0_0_0_0" into the seven remove_* flags
+def parse_combination(combination:str)->tuple:
+    flags = tuple(bool(int(flag)) for flag in combination.split("_"))
+
+    if len(flags) != 7:
+        raise ValueError("Combination must have seven remove_* flags: " + combination)
+
+    return flags
+
+
+def run_ablation(file_path, output_folder, test_type, combinations, stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, corpus_root=data_input.document_retriever.default_corpus_root):
+    """
+    Summarizes a topics file once for every combination of compression flags, writing each
+    combination's summaries to outputs/<output_folder>_<combination>_devtest/ (or _evaltest/)
+    and its ROUGE scores to results/, with the same names as the condor_D4_tests jobs
+
+    Args:
+        file_path:str file path on patas that leads to directory that holds training or testing data
+        output_folder: prefix of the folders to write summaries to
+        test_type: either 'dev' for devtest data, or 'eval' for evaltest data
+        combinations: list of remove_* flag combinations such as "1_1_0_0_0_0_0", see parse_combination
+        corpus_root:str directory holding the LDC02T31, LDC08T25 and LDC11T07 corpora
+        all other args are those of text_summarizer.summarize_text
+
+    """
+
+    folder_suffix = "_devtest" if test_type == "dev" else "_evaltest"
+    combination_folders = {combination: output_folder + "_" + combination + folder_suffix for combination in combinations}
+
+    def configure(combination):
+        configure_class_objects(stemming, lower, idf_type, tf_type, *parse_combination(combination))
+
+    #### Sentences whose clean text is the same under several combinations are parsed once
+    data_input.spacy_parse_memo = {}
+
+    try:
+        # The gold summaries the entity model is trained on are compressed with each combination's flags
+        if info_order_type == "entity":
+            for combination in combinations:
+                configure(combination)
+                build_entity_model(combination_folders[combination], num_permutations)
+
+            data_input.spacy_parse_memo.clear()
+
+        for topic_attributes, doc_attributes in iter_topic_attributes(get_raw_topics(file_path), get_categories(file_path), corpus_root=corpus_root):
+
+            for combination in combinations:
+                configure(combination)
+                topic = build_topic(topic_attributes, doc_attributes)
+
+                summarize_topics_batch([topic], combination_folders[combination], d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations)
+
+            # Parses are only shared between the combinations of one topic so they don't pile up
+            data_input.spacy_parse_memo.clear()
+
+    finally:
+        data_input.spacy_parse_memo = None
+
+    data_input.Sentence.stem_table.save()
+
+    # Evaluates summaries of each combination
+    # by running ROUGE-1 & ROUGE-2
+    for combination in combinations:
+        eval_summary(combination_folders[combination], test_type)
+
+
+if __name__ == '__main__':
+
+    # Same positional arguments as text_summarizer.py up to num_permutations
+    p = argparse.ArgumentParser()
+    p.add_argument('dev_file')
+    p.add_argument('eval_file')
+    p.add_argument('output_folder')
+    p.add_argument('test_type')
+    p.add_argument('stemming')
+    p.add_argument('lower')
+    p.add_argument('idf_type')
+    p.add_argument('tf_type')
+    p.add_argument('d')
+    p.add_argument('intersent_threshold')
+    p.add_argument('summary_threshold')
+    p.add_argument('epsilon')
+    p.add_argument('mle_lambda')
+    p.add_argument('k')
+    p.add_argument('min_sent_len')
+    p.add_argument('include_narrative')
+    p.add_argument('bias_formula')
+    p.add_argument('intersent_formula')
+    p.add_argument('info_order_type')
+    p.add_argument('num_permutations')
+    p.add_argument('--combinations', nargs='+', default=default_combinations)
+    args = p.parse_args()
+
+    settings = (bool(int(args.stemming)), bool(int(args.lower)), str(args.idf_type), str(args.tf_type), float(args.d),
+                float(args.intersent_threshold), float(args.summary_threshold), float(args.epsilon), float(args.mle_lambda),
+                int(args.k), int(args.min_sent_len), bool(int(args.include_narrative)), str(args.bias_formula),
+                str(args.intersent_formula), str(args.info_order_type), int(args.num_permutations))
+
+    # Run on either dev, eval, or both depending on test_type
+    if args.test_type in ("dev", "both"):
+        run_ablation(args.dev_file, args.output_folder, "dev", args.combinations, *settings)
+
+    if args.test_type in ("eval", "both"):
+        run_ablation(args.eval_file, args.output_folder, "eval", args.combinations, *settings)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Times the sentence preprocessing steps of data_input on synthetic news sentences, e.g. the
+per sentence NLTK POS tagging path against tagging a whole document in one batch, or
+Porter stemming every token against the memoized Stem_Table. --check_prefilter reports how many
+sentences the compression pre-filter skips and whether skipping them changes any output"""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import argparse
+import random
+import subprocess
+import sys
+import time
+
+import synthetic_corpus
+
+
+# Returns documents of synthetic sentences as lists of sentence strings
+def make_documents(num_docs:int, sentences_per_doc:int, seed:int=573)->list:
+    rng = random.Random(seed)
+    return [[synthetic_corpus.make_sentence(rng) for _ in range(sentences_per_doc)] for _ in range(num_docs)]
+
+
+# Tags every sentence with its own word_tokenize and pos_tag call, as Sentence does without tagged_sent
+def tag_per_sentence(documents:list):
+    from data_input import word_tokenize, pos_tag, Sentence
+    return [[pos_tag(word_tokenize(Sentence.normalize(sentence))) for sentence in sentences] for sentences in documents]
+
+
+# Tags each document with one pos_tag_sents call, as Document.create_sentence_list does
+def tag_per_document(documents:list):
+    from data_input import tag_sentences
+    return [tag_sentences(sentences) for sentences in documents]
+
+
+# Porter stems every token occurrence, as Sentence did before the stem table
+def stem_per_token(documents:list):
+    from nltk import PorterStemmer, word_tokenize
+    ps = PorterStemmer()
+    return [[[ps.stem(token) for token in word_tokenize(sentence)] for sentence in sentences] for sentences in documents]
+
+
+# Stems every token occurrence through a fresh Stem_Table and prints its hit rate
+def stem_memoized(documents:list):
+    from nltk import word_tokenize
+    from stem_table import Stem_Table
+    stem_table = Stem_Table()
+    stems = [[[stem_table.stem(token) for token in word_tokenize(sentence)] for sentence in sentences] for sentences in documents]
+    print("stem table: {}".format(stem_table.stats()))
+    return stems
+
+
+# Compresses every sentence with its own spaCy call, with every remove_* rule on
+def compress_per_sentence(documents:list):
+    from data_input import get_spacy_model
+    from content_realization import get_compressed_sentences
+    spacy_model = get_spacy_model()
+    return [[get_compressed_sentences(sentence, spacy_model, True, True, True, True, True, True, True) for sentence in sentences] for sentences in documents]
+
+
+# Compresses all sentences with one nlp.pipe call, as build_topic does for each topic
+def compress_batched(documents:list):
+    from data_input import get_spacy_model
+    from content_realization import get_compressed_sentences_batch
+    return get_compressed_sentences_batch([sentence for sentences in documents for sentence in sentences], get_spacy_model(), True, True, True, True, True, True, True)
+
+
+# Compresses all sentences with one nlp.pipe call, parsing only those content_realization.could_trim finds a cue in
+def compress_prefiltered(documents:list):
+    from data_input import get_spacy_model
+    from content_realization import get_compressed_sentences_batch
+    return get_compressed_sentences_batch([sentence for sentences in documents for sentence in sentences], get_spacy_model(), True, True, True, True, True, True, True, prefilter=True)
+
+
+benchmarks = {"tag_per_sentence": tag_per_sentence, "tag_per_document": tag_per_document, "stem_per_token": stem_per_token, "stem_memoized": stem_memoized,
+              "compress_per_sentence": compress_per_sentence, "compress_batched": compress_batched, "compress_prefiltered": compress_prefiltered}
+
+
+#### Run in a fresh interpreter so that nothing is already imported or loaded
+startup_script = """
+import time
+start = time.perf_counter()
+import data_input
+imported = time.perf_counter()
+data_input.get_spacy_model()
+loaded = time.perf_counter()
+print(imported - start, loaded - imported)
+"""
+
+
+# Times importing data_input and then loading the spaCy model on first use, each in a new process
+def startup(runs:int):
+    print("{:<20}{:>14}{:>16}".format("run", "import secs", "spaCy load secs"))
+
+    for run in range(runs):
+        output = subprocess.run([sys.executable, "-c", startup_script], stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+        import_seconds, load_seconds = (float(seconds) for seconds in output.split()[-2:])
+
+        print("{:<20}{:>14.2f}{:>16.2f}".format(run + 1, import_seconds, load_seconds))
+
+
+#### remove_appos, remove_advcl, remove_relcl and remove_acl settings checked by check_prefilter
+prefilter_rules = [(True, False, False, False), (False, True, False, False), (False, False, True, False), (False, False, False, True), (True, True, True, True)]
+
+
+# Parses every sentence once and, for each rule setting, counts the sentences the pre-filter would skip
+# and how many of those a parse would have trimmed, i.e. the sentences whose output the pre-filter changes
+def check_prefilter(sentences:list):
+    from data_input import get_spacy_model
+    from content_realization import clean_sentence, could_trim, get_trimmed_sentences, parse_sentences
+
+    clean_sents = [clean_sent for clean_sent in (clean_sentence(sentence, True, True, True) for sentence in sentences) if clean_sent]
+    docs = parse_sentences(clean_sents, get_spacy_model(), 1000, 1)
+
+    print("{:<20}{:>12}{:>10}{:>10}{:>10}".format("appos advcl relcl acl", "sentences", "skipped", "skip %", "changed"))
+
+    for rules in prefilter_rules:
+        skipped = changed = 0
+
+        for clean_sent, doc in zip(clean_sents, docs):
+            if not could_trim(clean_sent, *rules):
+                skipped += 1
+                changed += any(trimmed_sent != clean_sent for trimmed_sent in get_trimmed_sentences(doc, *rules))
+
+        print("{:<20}{:>12}{:>10}{:>10.1f}{:>10}".format(" ".join(str(int(rule)) for rule in rules), len(clean_sents), skipped, 100 * skipped / len(clean_sents), changed))
+
+
+def benchmark(names:list, num_docs:int, sentences_per_doc:int):
+    import data_input  #### Loads NLTK stopwords before timing starts
+
+    if any(name.startswith("compress") for name in names):
+        data_input.get_spacy_model()  #### Loaded before timing starts
+
+    documents = make_documents(num_docs, sentences_per_doc)
+    num_sentences = num_docs * sentences_per_doc
+
+    print("{:<20}{:>12}{:>10}{:>14}".format("benchmark", "sentences", "seconds", "sentences/sec"))
+
+    for name in names:
+        start = time.perf_counter()
+        benchmarks[name](documents)
+        seconds = time.perf_counter() - start
+
+        print("{:<20}{:>12}{:>10.2f}{:>14.1f}".format(name, num_sentences, seconds, num_sentences / seconds))
+
+
+if __name__ == '__main__':
+
+    p = argparse.ArgumentParser()
+    p.add_argument('--benchmarks', nargs='+', default=list(benchmarks), choices=list(benchmarks))
+    p.add_argument('--num_docs', type=int, default=100)
+    p.add_argument('--sentences_per_doc', type=int, default=15)
+    p.add_argument('--startup', type=int, default=0, help="number of data_input import and spaCy load timings to run instead of the benchmarks")
+    p.add_argument('--check_prefilter', action='store_true', help="report the compression pre-filter skip rate and changed outputs instead of running the benchmarks")
+    p.add_argument('--sentences_file', default=None, help="file of sentences, one per line, for --check_prefilter instead of synthetic sentences")
+    args = p.parse_args()
+
+    if args.startup:
+        startup(args.startup)
+    elif args.check_prefilter:
+        if args.sentences_file:
+            with open(args.sentences_file) as file:
+                check_sentences = [line.strip() for line in file if line.strip()]
+        else:
+            check_sentences = [sentence for sentences in make_documents(args.num_docs, args.sentences_per_doc) for sentence in sentences]
+        check_prefilter(check_sentences)
+    else:
+        benchmark(args.benchmarks, args.num_docs, args.sentences_per_doc)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Measures document retrieval throughput (docs/sec, bytes parsed and peak memory) of the
+Document_Retriever modes and of get_data on a topics file, e.g. one written by synthetic_corpus.py"""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+from lxml import etree
+
+import document_retriever
+
+retrieval_modes = ["tree", "tree_lru", "streaming", "index", "batch", "prefetch"]
+
+#### Kept in the repo's outputs/ directory, wherever the benchmark is run from
+default_index_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "outputs", "doc_index.json")
+
+
+# Reads the doc ids of every topic in a TAC topics file, in topic order
+def read_topic_doc_ids(topics_path:str)->list:
+    tree = etree.parse(topics_path, etree.XMLParser(recover=True))
+    return [[doc.get("id") for doc in topic.iter("doc")] for topic in tree.iter("topic")]
+
+
+# Retrieves every document of the topics file with one retrieval mode.
+# Returns the number of documents and bytes handed to the parsers
+def run_retrieval(mode:str, topic_doc_ids:list, corpus_root:str, index_path:str):
+    doc_ids = [doc_id for doc_ids in topic_doc_ids for doc_id in doc_ids]
+
+    if mode == "prefetch":
+        prefetcher = document_retriever.Doc_Prefetcher(topic_doc_ids, corpus_root=corpus_root)
+        num_docs = sum(len(prefetcher.get_topic_docs(topic_index)) for topic_index in range(len(topic_doc_ids)))
+        prefetcher.shutdown()
+        return num_docs, None
+
+    doc_ret = document_retriever.Document_Retriever(corpus_root=corpus_root, streaming=(mode == "streaming"),
+                                                    index_path=index_path if mode == "index" else None,
+                                                    cache_max_entries=1 if mode == "tree_lru" else None)
+    if mode == "batch":
+        num_docs = len(doc_ret.retrieve_docs(doc_ids))
+    else:
+        num_docs = sum(1 for doc_id in doc_ids if doc_ret.retrieve_doc(doc_id) is not None)
+
+    return num_docs, doc_ret.bytes_parsed
+
+
+def run_get_data(topics_path:str, corpus_root:str, topic_workers:int):
+    from data_input import get_data  #### Only imported here since it loads NLTK data
+
+    topics = get_data(topics_path, True, False, "smooth_idf", "term_frequency", False, False, False, False, False, False, False, corpus_root=corpus_root, topic_workers=topic_workers)
+    return sum(len(topic.document_list) for topic in topics), None
+
+
+# Runs one benchmark in its own process so that peak memory is measured for that mode alone
+def measure(mode:str, topics_path:str, corpus_root:str, index_path:str, topic_workers:int, results):
+    start = time.perf_counter()
+
+    if mode == "get_data":
+        num_docs, bytes_parsed = run_get_data(topics_path, corpus_root, topic_workers)
+    else:
+        num_docs, bytes_parsed = run_retrieval(mode, read_topic_doc_ids(topics_path), corpus_root, index_path)
+
+    seconds = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  #### Kilobytes on Linux
+    results.put((mode, num_docs, seconds, bytes_parsed, peak_kb))
+
+
+def benchmark(topics_path:str, corpus_root:str, modes:list, index_path:str, topic_workers:int=0):
+    results = multiprocessing.Queue()
+
+    print("{:<10}{:>8}{:>10}{:>12}{:>16}{:>14}".format("mode", "docs", "seconds", "docs/sec", "bytes parsed", "peak MB"))
+
+    for mode in modes:
+        process = multiprocessing.Process(target=measure, args=(mode, topics_path, corpus_root, index_path, topic_workers, results))
+        process.start()
+        process.join()
+
+        if process.exitcode != 0:
+            print("{:<10}failed".format(mode))
+            continue
+
+        mode, num_docs, seconds, bytes_parsed, peak_kb = results.get()
+
+        print("{:<10}{:>8}{:>10.2f}{:>12.1f}{:>16}{:>14.1f}".format(mode, num_docs, seconds, num_docs / seconds,
+                                                                 "-" if bytes_parsed is None else bytes_parsed, peak_kb / 1024))
+
+
+if __name__ == '__main__':
+
+    p = argparse.ArgumentParser()
+    p.add_argument('topics_path')
+    p.add_argument('corpus_root')
+    p.add_argument('--modes', nargs='+', default=retrieval_modes, choices=retrieval_modes + ["get_data"])
+    p.add_argument('--index_path', default=default_index_path, help="document index used by the index mode (outputs/doc_index.json by default)")
+    p.add_argument('--topic_workers', type=int, default=0, help="worker processes used by the get_data mode to build topics")
+    args = p.parse_args()
+
+    benchmark(args.topics_path, args.corpus_root, args.modes, args.index_path, args.topic_workers)
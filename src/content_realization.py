@@ -7,20 +7,51 @@ that generates cleaned and compressed versions of sentences."""
 __author__ = "Amina Venton, Shannon Ladymon"
 __email__ = "aventon@uw.edu, sladymon@uw.edu"
 
-import spacy
 import re
 
 
+# Words and punctuation that the clauses removed by each dependency rule usually start with, see could_trim
+appos_cues = {",", "(", "--", ":", ";"}
+relcl_cues = {"who", "whom", "whose", "which", "that", "where", "when", "why"}
+advcl_cues = {"after", "although", "as", "because", "before", "if", "once", "since", "though", "till", "unless", "until", "when", "whenever", "where", "whereas", "wherever", "whether", "while"}
+
+# Words that are not the noun a clausal modifier attaches to: auxiliaries, pronouns, determiners and conjunctions,
+# so "was arrested" or "they said" don't count as a participle after a noun
+function_words = {"a", "an", "the", "this", "that", "these", "those", "am", "is", "are", "was", "were", "be", "been", "being",
+                  "has", "have", "had", "having", "do", "does", "did", "will", "would", "shall", "should", "can", "could", "may",
+                  "might", "must", "not", "never", "i", "you", "he", "she", "it", "we", "they", "me", "him", "us", "them",
+                  "who", "which", "and", "or", "but", "to", "also", "just", "still", "already", "then", "get", "got"}
+
+# Words with participle endings that are not participles
+participle_exceptions = {"during", "morning", "evening", "nothing", "something", "anything", "everything", "ceiling", "hundred",
+                         "indeed", "speed", "according", "including", "following", "regarding", "concerning", "king", "thing",
+                         "ring", "wedding", "building", "bed", "red", "need", "feed", "seed", "shed"}
+
+# Irregular past participles common in news text
+irregular_participles = {"born", "built", "known", "led", "made", "given", "taken", "held", "seen", "shown", "sent", "told",
+                         "written", "found", "paid", "sold", "kept", "brought", "caught", "chosen", "won", "lost", "spent",
+                         "begun", "done", "gone", "stolen", "broken", "driven", "drawn", "grown", "thrown", "worn", "hit", "hurt", "set", "put"}
+
+# Splits a sentence into words, dashes and single punctuation marks for could_trim
+cue_token_re = re.compile(r"\w+|--|[^\w\s]")
+
+# Matches regular participles, which head most reduced clausal modifiers
+participle_re = re.compile(r"[a-z]{3,}(ed|ing)$")
+
+# Matches words that can follow the "to" of an infinitive, leaving out numbers, names and plural nouns as in "to reporters"
+infinitive_re = re.compile(r"[a-z]+([^s]|ss|us)$")
+
+
 def remove_subtree(doc, clean_sent, indices_to_remove_subtree):
     """
     This function removes a subtree given a spaCy Doc object and
-    the indices of each token to remove. The indices are used in a
-    spaCy Span object to get the tokens of the subtree.
+    the indices of each token to remove. The tokens are cut out of the
+    clean sentence by their character offsets, so only the span at these
+    indices is removed even if the same words occur elsewhere in the sentence.
 
     Note:
-        Span object -> slice doc[start : end]
-            start: The index of the first token of the span
-            end: The index of the first token after the span.
+        Indices that are not contiguous are removed as separate spans,
+        see get_removal_spans.
 
     Args:
         doc: spaCy Doc of the clean sentence
@@ -32,58 +63,100 @@ def remove_subtree(doc, clean_sent, indices_to_remove_subtree):
 
     """
 
-    # Create span of the subtree to be removed
-    span_of_subtree_start = indices_to_remove_subtree[0]
-    span_of_subtree_end = indices_to_remove_subtree[-1] + 1
-    span_to_be_removed = doc[span_of_subtree_start:span_of_subtree_end].text
+    return remove_spans(doc, clean_sent, get_removal_spans(indices_to_remove_subtree))
 
-    # Remove span from the clean sentence
-    new_sent = clean_sent.replace(span_to_be_removed, "")
 
-    # Return the new sentence
-    return new_sent
+def remove_spans(doc, clean_sent, spans):
+    """
+    Cuts token spans out of the clean sentence by character offsets.
 
+    Args:
+        doc: spaCy Doc of the clean sentence
+        clean_sent:str the string of the clean sentence Doc object
+        spans: sorted, non-overlapping list of (start, end) token index spans, end exclusive
 
-def find_subtree_indices(doc, dependency_type):
+    Return:
+        new_sent:str the sentence without the spans
     """
-    This function finds and returns the indices of the entire clause
-    (each token) in the subtree to be removed.
+
+    pieces = []
+    kept_from = 0
+
+    for start, end in spans:
+        # Character offsets of the first token and the end of the last token (without its trailing whitespace)
+        last_token = doc[end - 1]
+        pieces.append(clean_sent[kept_from:doc[start].idx])
+        kept_from = last_token.idx + len(last_token.text)
+
+    pieces.append(clean_sent[kept_from:])
+
+    return "".join(pieces)
+
+
+def get_removal_spans(indices):
+    """
+    Groups token indices into contiguous (start, end) spans, end exclusive.
+
+    Args:
+        indices: iterable of token indices, in any order and possibly repeated
+
+    Return:
+        spans: sorted list of (start, end) spans
+    """
+
+    spans = []
+
+    for index in sorted(set(indices)):
+        if spans and spans[-1][1] == index:
+            spans[-1] = (spans[-1][0], index + 1)
+        else:
+            spans.append((index, index + 1))
+
+    return spans
+
+
+def find_dependency_indices(doc, dependency_types):
+    """
+    Finds the indices of every token in the subtrees of each dependency type
+    with a single pass over the doc.
 
     Args:
         doc: spaCy Doc of the clean sentence
-        dependency_type:str Options are "appos", "acl", "relcl", "advcl"
+        dependency_types: list of dependency types, options are "appos", "acl", "relcl", "advcl"
 
     Return:
-        indices_to_remove_subtree: list of indices of the subtree
+        indices_by_dependency: dict of dependency type to the set of indices of its subtree tokens,
+        empty for a dependency type that is not found
 
     """
 
-    # List of indices of clause tokens to be removed in the sentence
-    indices_to_remove_subtree = []
+    indices_by_dependency = {dependency_type: set() for dependency_type in dependency_types}
 
-    # List of unique spaCy hashes for string tokens in the doc
-    # Position remains the same from original doc
-    hash_ids_of_tokens = [token.orth for token in doc]
+    for token in doc:
+        indices_to_remove_subtree = indices_by_dependency.get(token.dep_)
 
-    # Iterate through the doc to get the dep clause subtree
-    for index, token in enumerate(doc):
+        # Subtree tokens already collected belong to an enclosing clause of the same type
+        if indices_to_remove_subtree is not None and token.i not in indices_to_remove_subtree:
+            indices_to_remove_subtree.update(subtree_token.i for subtree_token in token.subtree)
 
-        # Check for dependency label
-        if token.dep_ == dependency_type:
+    return indices_by_dependency
 
-            # Get the indices of subtree- all tokens of the clause
-            for subtree_token in token.subtree:
-                # Get the unique hash id for the subtree token
-                subtree_token_id = subtree_token.orth
 
-                # Look up the token's index in the doc
-                subtree_token_index_in_doc = hash_ids_of_tokens.index(subtree_token_id)
+def find_subtree_indices(doc, dependency_type):
+    """
+    This function finds and returns the indices of the entire clause
+    (each token) in the subtree to be removed.
 
-                # Add to list of indices to be removed
-                indices_to_remove_subtree.append(subtree_token_index_in_doc)
+    Args:
+        doc: spaCy Doc of the clean sentence
+        dependency_type:str Options are "appos", "acl", "relcl", "advcl"
 
-    # Return list of indices
-    return indices_to_remove_subtree
+    Return:
+        indices_to_remove_subtree: sorted list of indices of the subtree
+
+    """
+
+    return sorted(find_dependency_indices(doc, [dependency_type])[dependency_type])
 
 
 def trim_sentence(doc, dependency_type):
@@ -91,16 +164,10 @@ def trim_sentence(doc, dependency_type):
     """
     This function trims a sentence given a spaCy Doc and
     the dependency type corresponding to the clause to be removed.
-    The Doc is converted to a string using a spaCy Span object.
 
     The new sentence with clause removed is returned.
     If no dependency found original clean sentence is returned.
 
-    Note:
-        Span object -> slice doc[start : end]
-            start: The index of the first token of the span
-            end: The index of the first token after the span.
-
     Args:
         doc: spaCy Doc of the clean sentence
         dependency_type:str Options are "appos", "acl", "relcl", "advcl"
@@ -111,28 +178,95 @@ def trim_sentence(doc, dependency_type):
 
     """
 
-    # Convert Doc to string using a Doc Span, whole Span-> no start and end
-    clean_sent = doc[:].text
+    return get_trimmed_sentences(doc, dependency_type == "appos", dependency_type == "advcl", dependency_type == "relcl", dependency_type == "acl")[0]
 
-    # Flag that indicates if dependency found, trim the sentence
-    dependency_found = any(True for token in doc if token.dep_ == dependency_type)
 
-    if dependency_found:
+def trim_spans(doc, clean_sent, spans):
+    """
+    Removes the token spans of a clause from the clean sentence and any
+    left over punctuation, or returns the clean sentence if there are no spans.
+    """
 
-        # Get list of indices of clause tokens to be removed in the sentence
-        indices_to_remove_subtree = find_subtree_indices(doc, dependency_type)
+    if not spans:
+        return clean_sent
 
-        # Remove the subtree and create new sentence
-        new_sent = remove_subtree(doc, clean_sent, indices_to_remove_subtree)
+    # Remove any left over punctuation from the subtree removal
+    return clean_punctuation(remove_spans(doc, clean_sent, spans))
 
-        # Remove any left over punctuation from the subtree removal
-        new_sent = clean_punctuation(new_sent)
 
-        # Return the new trimmed sentence
-        return new_sent
+def could_trim(clean_sent, remove_appos, remove_advcl, remove_relcl, remove_acl):
+    """
+    Cheap lexical test of whether a dependency rule could trim a clean sentence. The enabled
+    rules' clauses usually come with a cue: a comma, parenthesis, dash, colon or semicolon (appos,
+    whose first word can be anything, e.g. a title or a name), a subordinator, an infinitive or a
+    participle opening a clause (advcl), a relative pronoun (relcl), or a participle after a noun
+    or an infinitive (acl). A sentence without any of them is not worth parsing, since every trimmed
+    version would be the clean sentence itself. This is a heuristic: a parse may still find a clause
+    without any cue, see benchmark_preprocessing.py --check_prefilter.
 
-    # Return original sentence if no dependency found
-    return clean_sent
+    Args:
+        clean_sent: clean sentence string
+        remove_appos: True if appositional modifier should be removed from the sentence
+        remove_advcl: True if adverbial clause modifier should be removed from the sentence
+        remove_relcl: True if relative clause modifier should be removed from the sentence
+        remove_acl: True if a finite or non-finite clausal modifier shoule be removed from the sentence
+
+    Returns:
+        True if the sentence should be parsed
+    """
+
+    tokens = cue_token_re.findall(clean_sent)
+    words = [token.lower() for token in tokens]
+
+    if remove_relcl and not relcl_cues.isdisjoint(words):
+        return True
+
+    if remove_appos and not appos_cues.isdisjoint(words):
+        return True
+
+    if remove_advcl and not advcl_cues.isdisjoint(words):
+        return True
+
+    # The other cues depend on the word before or after, so the sentence is scanned once for them
+    if not (remove_advcl or remove_acl):
+        return False
+
+    for i, word in enumerate(words):
+        previous = tokens[i - 1] if i else ""
+        following = tokens[i + 1] if i + 1 < len(tokens) else ""
+
+        # An infinitive, as in "to help them" or "plans to leave"
+        if word == "to" and (remove_advcl or remove_acl) and infinitive_re.match(following) and following not in function_words:
+            return True
+
+        if is_participle(word):
+            # A participle opening the sentence or a clause, as in "Speaking to reporters, Obama ..."
+            if remove_advcl and (i == 0 or previous == ","):
+                return True
+
+            # A participle after a common noun, as in "questions asked by reporters", leaving out names
+            # and function words that mostly come before a verb, as in "Obama answered" or "was asked"
+            if remove_acl and previous.isalpha() and previous.islower() and previous not in function_words and not previous.endswith("ly"):
+                return True
+
+    return False
+
+
+def is_participle(word):
+    """
+    Tests whether a word looks like a participle, from its ending or a list of irregular participles.
+
+    Args:
+        word: lowercase word string
+
+    Returns:
+        True if the word looks like a participle
+    """
+
+    if word in irregular_participles:
+        return True
+
+    return participle_re.match(word) is not None and word not in participle_exceptions
 
 
 def clean_sentence(original_sent, remove_header, remove_parens, remove_quotes):
@@ -238,7 +372,7 @@ def clean_punctuation(sent):
     return sent
 
 
-def get_compressed_sentences(original_sent, spacy_parser, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl):
+def get_compressed_sentences(original_sent, spacy_parser, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, prefilter=False):
     """
     This function performs sentence compression given an sentence string and rule-type.
    
@@ -252,6 +386,7 @@ def get_compressed_sentences(original_sent, spacy_parser, remove_header, remove_
         remove_advcl: True if adverbial clause modifier should be removed from the sentence
         remove_relcl: True if relative clause modifier should be removed from the sentence
         remove_acl: True if a finite or non-finite clausal modifier shoule be removed from the sentence
+        prefilter: True skips parsing the sentence when could_trim finds no cue for any enabled rule
 
     Returns:
         sentences_list: list of compressed versions of the original sentence
@@ -268,26 +403,280 @@ def get_compressed_sentences(original_sent, spacy_parser, remove_header, remove_
     # Remove branches of syntax tree from spaCy Doc
     # Sentences will only be trimmed if sent len > 0 and at least one rule condition is met
     if clean_sent and (remove_appos or remove_advcl or remove_relcl or remove_acl):
-        doc = spacy_parser(clean_sent)
-    
-        # Remove appositional modifiers (appos)
-        if remove_appos:
-            new_sent = trim_sentence(doc, "appos")
-            sentences_list.append(new_sent)
-
-        # Remove adverbial clausal modifiers (advcl)
-        if remove_advcl:
-            new_sent = trim_sentence(doc, "advcl")
-            sentences_list.append(new_sent)
-
-        # Remove relative clauses (relcl)
-        if remove_relcl:
-            new_sent = trim_sentence(doc, "relcl")
-            sentences_list.append(new_sent)
-
-        # Remove clausal modifiers (acl)
-        if remove_acl:
-            new_sent = trim_sentence(doc, "acl")
-            sentences_list.append(new_sent)  
+
+        # A sentence that can't be trimmed is its own trimmed version for each rule
+        if prefilter and not could_trim(clean_sent, remove_appos, remove_advcl, remove_relcl, remove_acl):
+            sentences_list.extend([clean_sent] * len(get_dependency_types(remove_appos, remove_advcl, remove_relcl, remove_acl)))
+        else:
+            doc = spacy_parser(clean_sent)
+
+            sentences_list.extend(get_trimmed_sentences(doc, remove_appos, remove_advcl, remove_relcl, remove_acl))
 
     return sentences_list
+
+
+def get_trimmed_sentences(doc, remove_appos, remove_advcl, remove_relcl, remove_acl):
+    """
+    Trims a parsed clean sentence once for each enabled dependency rule.
+
+    Args:
+        doc: spaCy Doc of the clean sentence
+        remove_appos: True if appositional modifier should be removed from the sentence
+        remove_advcl: True if adverbial clause modifier should be removed from the sentence
+        remove_relcl: True if relative clause modifier should be removed from the sentence
+        remove_acl: True if a finite or non-finite clausal modifier shoule be removed from the sentence
+
+    Returns:
+        trimmed_list: list of trimmed sentence strings, in appos, advcl, relcl, acl order
+    """
+
+    # Convert Doc to string using a Doc Span, whole Span-> no start and end
+    clean_sent = doc[:].text
+
+    dependency_types = get_dependency_types(remove_appos, remove_advcl, remove_relcl, remove_acl)
+    indices_by_dependency = find_dependency_indices(doc, dependency_types)
+
+    trimmed_list = [trim_spans(doc, clean_sent, get_removal_spans(indices_by_dependency[dependency_type])) for dependency_type in dependency_types]
+
+    return trimmed_list
+
+
+def get_dependency_types(remove_appos, remove_advcl, remove_relcl, remove_acl):
+    "Returns the dependency types of the enabled rules, in appos, advcl, relcl, acl order"
+
+    return [dependency_type for remove_dependency, dependency_type in ((remove_appos, "appos"), (remove_advcl, "advcl"), (remove_relcl, "relcl"), (remove_acl, "acl")) if remove_dependency]
+
+
+def parse_sentences(sentences, spacy_parser, batch_size, n_process):
+    """
+    Parses a list of sentence strings with a single spacy_parser.pipe call.
+
+    Args:
+        sentences: list of sentence strings
+        spacy_parser: spaCy model, or any parser with the same pipe method
+        batch_size: number of sentences spaCy parses together
+        n_process: number of processes spaCy parses with, more than 1 needs spaCy 2.2 or later
+
+    Returns:
+        docs: list of spaCy Docs in the same order as sentences
+    """
+
+    if not sentences:
+        return []
+
+    # spaCy 2.1 has no n_process argument, so it is only passed when asked for
+    if n_process == 1:
+        return list(spacy_parser.pipe(sentences, batch_size=batch_size))
+
+    return list(spacy_parser.pipe(sentences, batch_size=batch_size, n_process=n_process))
+
+
+def get_compressed_sentences_batch(original_sents, spacy_parser, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, batch_size=1000, n_process=1, prefilter=False):
+    """
+    Performs the same sentence compression as get_compressed_sentences on a list of sentences,
+    parsing all of the clean sentences that need trimming with one spacy_parser.pipe call.
+
+    Args:
+        original_sents: list of original sentence strings, e.g. every sentence of a document or topic
+        spacy_parser: spaCy model, or any parser with the same pipe method
+        batch_size: number of sentences spaCy parses together
+        n_process: number of processes spaCy parses with, more than 1 needs spaCy 2.2 or later
+        all other args are those of get_compressed_sentences
+
+    Returns:
+        compressed_list: one list of compressed sentence strings per original sentence,
+        each the same as get_compressed_sentences returns
+    """
+
+    # Get clean version of each sentence
+    clean_sents = [clean_sentence(original_sent, remove_header, remove_parens, remove_quotes) for original_sent in original_sents]
+
+    compressed_list = [[clean_sent] for clean_sent in clean_sents]
+
+    # Sentences will only be trimmed if sent len > 0 and at least one rule condition is met
+    if remove_appos or remove_advcl or remove_relcl or remove_acl:
+        to_trim = [index for index, clean_sent in enumerate(clean_sents) if clean_sent]
+        trimmed_list = get_trimmed_sentences_batch([clean_sents[index] for index in to_trim], spacy_parser, remove_appos, remove_advcl, remove_relcl, remove_acl, batch_size, n_process, prefilter)
+
+        for index, trimmed_sents in zip(to_trim, trimmed_list):
+            compressed_list[index].extend(trimmed_sents)
+
+    return compressed_list
+
+
+def get_trimmed_sentences_batch(clean_sents, spacy_parser, remove_appos, remove_advcl, remove_relcl, remove_acl, batch_size=1000, n_process=1, prefilter=False):
+    """
+    Trims a list of non-empty clean sentences with get_trimmed_sentences, parsing them with one spacy_parser.pipe call.
+
+    Args:
+        clean_sents: list of non-empty clean sentence strings
+        spacy_parser: spaCy model, or any parser with the same pipe method
+        batch_size: number of sentences spaCy parses together
+        n_process: number of processes spaCy parses with, more than 1 needs spaCy 2.2 or later
+        prefilter: True only parses the sentences that could_trim finds a cue in. The others are
+            returned untrimmed, the same as get_trimmed_sentences returns when no clause is found
+        all other args are those of get_trimmed_sentences
+
+    Returns:
+        trimmed_list: one list of trimmed sentence strings per clean sentence
+    """
+
+    # A sentence that can't be trimmed is its own trimmed version for each rule
+    num_rules = len(get_dependency_types(remove_appos, remove_advcl, remove_relcl, remove_acl))
+    trimmed_list = [[clean_sent] * num_rules for clean_sent in clean_sents]
+
+    to_parse = [index for index, clean_sent in enumerate(clean_sents) if not prefilter or could_trim(clean_sent, remove_appos, remove_advcl, remove_relcl, remove_acl)]
+    docs = parse_sentences([clean_sents[index] for index in to_parse], spacy_parser, batch_size, n_process)
+
+    for index, doc in zip(to_parse, docs):
+        trimmed_list[index] = get_trimmed_sentences(doc, remove_appos, remove_advcl, remove_relcl, remove_acl)
+
+    return trimmed_list
+
+
+def get_sentence_annotations(doc, indices_to_remove, new_sent=None):
+    """
+    Returns the tokens, POS tags and lemmas of a parsed sentence, leaving out
+    the tokens at the given indices and any whitespace tokens.
+
+    Args:
+        doc: spaCy Doc of the clean sentence
+        indices_to_remove: set of indices of tokens removed from the sentence
+        new_sent: optional trimmed sentence string. Tokens that are not in it, e.g. the
+            punctuation clean_punctuation removed after the clause, are also left out
+
+    Return:
+        tagged_sent: list of (token, Penn Treebank tag) pairs
+        lemmas: list of the lemma of each token in tagged_sent
+
+    """
+
+    kept_tokens = [token for token in doc if token.i not in indices_to_remove and not token.is_space]
+
+    if new_sent is not None:
+        kept_tokens = match_tokens(kept_tokens, new_sent)
+
+    tagged_sent = [(token.text, token.tag_) for token in kept_tokens]
+    # spaCy 2 lemmatizes pronouns to "-PRON-" and models without a lemmatizer give empty lemmas, so these keep the token text
+    lemmas = [token.lemma_ if token.lemma_ and token.lemma_ != "-PRON-" else token.text for token in kept_tokens]
+
+    return tagged_sent, lemmas
+
+
+def match_tokens(tokens, sent):
+    """
+    Returns the tokens whose text is found in order in a sentence. Each token is looked for
+    right after the previous match and any whitespace, and is dropped if it is not there.
+
+    Args:
+        tokens: list of spaCy Tokens in sentence order
+        sent: string made of the text of some of the tokens, e.g. after clean_punctuation
+
+    Return:
+        matched_tokens: list of the tokens found in the sentence
+    """
+
+    matched_tokens = []
+    position = 0
+
+    for token in tokens:
+        start = position
+        while start < len(sent) and sent[start].isspace():
+            start += 1
+
+        if sent.startswith(token.text, start):
+            matched_tokens.append(token)
+            position = start + len(token.text)
+
+    return matched_tokens
+
+
+def get_annotated_sentences(original_sent, spacy_parser, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl):
+    """
+    Performs the same sentence compression as get_compressed_sentences, but also returns
+    the tokens, POS tags and lemmas of every compressed sentence. These all come from the
+    single spaCy parse of the clean sentence, so the compressed sentences do not need to
+    be tokenized and tagged again.
+
+    Args:
+        original_sent: original sentence string
+        spacy_parser: spaCy parser model
+        remove_header: True if the header should be removed from the sentence
+        remove_parens: True if parenthetical information should be removed from the sentence
+        remove_quotes: True if unpaired quotes should be removed from the sentence
+        remove_appos: True if appositional modifier should be removed from the sentence
+        remove_advcl: True if adverbial clause modifier should be removed from the sentence
+        remove_relcl: True if relative clause modifier should be removed from the sentence
+        remove_acl: True if a finite or non-finite clausal modifier shoule be removed from the sentence
+
+    Returns:
+        annotated_list: list of (sentence string, tagged_sent, lemmas) tuples in the
+        same order as the sentences returned by get_compressed_sentences
+
+    """
+
+    # Get clean version of the sentence
+    clean_sent = clean_sentence(original_sent, remove_header, remove_parens, remove_quotes)
+
+    # An empty sentence has nothing to parse or trim
+    if not clean_sent:
+        return [(clean_sent, [], [])]
+
+    # The clean sentence is parsed even if no rule is set, since the parse supplies its tokens
+    doc = spacy_parser(clean_sent)
+
+    return get_annotated_variants(doc, remove_appos, remove_advcl, remove_relcl, remove_acl)
+
+
+def get_annotated_variants(doc, remove_appos, remove_advcl, remove_relcl, remove_acl):
+    """
+    Returns the parsed clean sentence and each of its trimmed versions along with their
+    tokens, POS tags and lemmas, see get_annotated_sentences.
+    """
+
+    clean_sent = doc[:].text
+
+    annotated_list = [(clean_sent,) + get_sentence_annotations(doc, set())]
+
+    dependency_types = get_dependency_types(remove_appos, remove_advcl, remove_relcl, remove_acl)
+
+    indices_by_dependency = find_dependency_indices(doc, dependency_types)
+
+    for dependency_type in dependency_types:
+        indices_to_remove = indices_by_dependency[dependency_type]
+        new_sent = trim_spans(doc, clean_sent, get_removal_spans(indices_to_remove))
+        annotated_list.append((new_sent,) + get_sentence_annotations(doc, indices_to_remove, new_sent))
+
+    return annotated_list
+
+
+def get_annotated_sentences_batch(original_sents, spacy_parser, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, batch_size=1000, n_process=1):
+    """
+    Performs the same annotated compression as get_annotated_sentences on a list of sentences,
+    parsing all of the non-empty clean sentences with one spacy_parser.pipe call.
+
+    Args:
+        original_sents: list of original sentence strings, e.g. every sentence of a document or topic
+        spacy_parser: spaCy model, or any parser with the same pipe method
+        batch_size: number of sentences spaCy parses together
+        n_process: number of processes spaCy parses with, more than 1 needs spaCy 2.2 or later
+        all other args are those of get_annotated_sentences
+
+    Returns:
+        annotated_list: one list of (sentence string, tagged_sent, lemmas) tuples per original sentence,
+        each the same as get_annotated_sentences returns
+    """
+
+    # Get clean version of each sentence
+    clean_sents = [clean_sentence(original_sent, remove_header, remove_parens, remove_quotes) for original_sent in original_sents]
+
+    # An empty sentence has nothing to parse or trim
+    annotated_list = [[(clean_sent, [], [])] for clean_sent in clean_sents]
+
+    to_parse = [index for index, clean_sent in enumerate(clean_sents) if clean_sent]
+    docs = parse_sentences([clean_sents[index] for index in to_parse], spacy_parser, batch_size, n_process)
+
+    for index, doc in zip(to_parse, docs):
+        annotated_list[index] = get_annotated_variants(doc, remove_appos, remove_advcl, remove_relcl, remove_acl)
+
+    return annotated_list
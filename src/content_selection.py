@@ -31,12 +31,41 @@ def _cosine_similarity(sentence_1, sentence_2):
         return denominator  
 
 
+def _build_cos_sim_matrix(sent_list, intersent_threshold, topic):
+    """
+    Builds and returns a 2D numpy matrix of inter-sentential cosine similarity
+    using the rows of the topic's sparse tf-idf matrix, before row normalization.
+    """
+    # Get the tf-idf rows of the sentences in sent_list order
+    rows = [sent.matrix_row for sent in sent_list]
+    tf_idf_rows = topic.tf_idf_matrix[rows]
+
+    # Dot products of every pair of sentences divided by the product of their lengths
+    numerators = (tf_idf_rows @ tf_idf_rows.T).toarray()
+    lengths = np.sqrt(numerators.diagonal())
+    denominators = np.outer(lengths, lengths)
+    sim_matrix = np.divide(numerators, denominators, out=np.zeros_like(numerators), where=denominators != 0)
+
+    # Only include similarities above the threshold
+    sim_matrix[sim_matrix < intersent_threshold] = 0.0
+
+    # If the same sentence, cosine sim is 1.0
+    np.fill_diagonal(sim_matrix, 1.0)
+
+    return sim_matrix
+
+
 def _build_sim_matrix(sent_list, intersent_threshold, intersent_formula, mle_lambda, k, topic):
     """
     Builds and returns a 2D numpy matrix of inter-sentential similarity.
     """
     num_sent = len(sent_list)
 
+    # Use the topic's tf-idf matrix for cosine similarity when it has been built
+    if intersent_formula != "norm" and topic is not None and topic.tf_idf_matrix is not None and num_sent > 0:
+        sim_matrix = _build_cos_sim_matrix(sent_list, intersent_threshold, topic)
+        return sim_matrix / sim_matrix.sum(axis=1, keepdims=True)
+
     # [num_sent] x [num_sent] matrix, defaulting to 0 for each similarity
     sim_matrix = np.zeros((num_sent, num_sent))
 
@@ -274,6 +303,35 @@ def _select_sentences(sorted_sentences, summary_threshold):
     return added_sents
 
 
+def _get_total_sentences(topic, min_sent_len):
+    """
+    Returns a list of all the sentence objects in a topic with at least min_sent_len words.
+    """
+    return [sent for doc in topic.document_list for sent in doc.sentence_list if sent.sent_len >= min_sent_len]
+
+
+def _rank_sentences(total_sentences, topic, d, intersent_threshold, epsilon, mle_lambda, k, include_narrative, bias_formula, intersent_formula):
+    """
+    Sets the score of each sentence in total_sentences to its Biased LexRank value.
+    """
+
+    # Build the inter-sentential cosine similarity matrix
+    sim_matrix = _build_sim_matrix(total_sentences, intersent_threshold, intersent_formula, mle_lambda, k, topic)
+
+    # Build the topic-sentence bias vec
+    bias_vec = _build_bias_vec(total_sentences, topic.title, include_narrative, bias_formula, mle_lambda, topic)
+
+    # Build a Markov Matrix using the inter-sentential and bias similarities
+    markov_matrix = _build_markov_matrix(sim_matrix, bias_vec, d)
+
+    # Get the Biased LexRank for the sentences using the power method
+    lex_rank_vec = _power_method(markov_matrix, epsilon)
+
+    # Add the lex_rank to each sentence.score
+    for i in range(len(total_sentences)):
+        total_sentences[i].score = lex_rank_vec[i]
+
+
 def select_content(topics_list, d = 0.7, intersent_threshold = 0.0, summary_threshold = 0.5, epsilon = 0.1, mle_lambda = 0.6, k = 20, min_sent_len = 5, include_narrative = False, bias_formula = "cos", intersent_formula = "cos"):
     """
     For each topic, creates summaries of <= 100 words (full sentences only) 
@@ -312,23 +370,19 @@ def select_content(topics_list, d = 0.7, intersent_threshold = 0.0, summary_thre
 
         # Get a list of all the sentence objects in this topic
         # Don't include sentences that are less than 5 words
-        total_sentences = [sent for doc in topic.document_list for sent in doc.sentence_list if sent.sent_len >= min_sent_len]
-
-        # Build the inter-sentential cosine similarity matrix
-        sim_matrix = _build_sim_matrix(total_sentences, intersent_threshold, intersent_formula, mle_lambda, k, topic)
-
-        # Build the topic-sentence bias vec
-        bias_vec = _build_bias_vec(total_sentences, topic_title, include_narrative, bias_formula, mle_lambda, topic)
+        total_sentences = _get_total_sentences(topic, min_sent_len)
 
-        # Build a Markov Matrix using the inter-sentential and bias similarities
-        markov_matrix = _build_markov_matrix(sim_matrix, bias_vec, d)
+        # Score the sentences with Biased LexRank
+        _rank_sentences(total_sentences, topic, d, intersent_threshold, epsilon, mle_lambda, k, include_narrative, bias_formula, intersent_formula)
 
-        # Get the Biased LexRank for the sentences using the power method
-        lex_rank_vec = _power_method(markov_matrix, epsilon)
+        # If the topic was built without clause removal, compress only the top ranked sentences
+        # and rank again with their compressed versions
+        if topic.compress_candidates:
+            candidates = sorted(total_sentences, reverse=True)[:topic.compress_candidates]
+            topic.add_compressed_variants(candidates)
 
-        # Add the lex_rank to each sentence.score
-        for i in range(len(total_sentences)):
-            total_sentences[i].score = lex_rank_vec[i]
+            total_sentences = _get_total_sentences(topic, min_sent_len)
+            _rank_sentences(total_sentences, topic, d, intersent_threshold, epsilon, mle_lambda, k, include_narrative, bias_formula, intersent_formula)
 
         # Sort the sentences by score
         sorted_sentences = sorted(total_sentences, reverse=True)
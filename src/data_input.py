@@ -5,18 +5,31 @@ __author__ = "Benny Longwill"
 __email__ = "longwill@uw.edu"
 
 
-from nltk import word_tokenize, sent_tokenize, pos_tag, PorterStemmer
+from nltk import word_tokenize, sent_tokenize, pos_tag, pos_tag_sents
 
 from nltk.corpus import stopwords
 
 from bs4 import BeautifulSoup
 import document_retriever
-from content_realization import get_compressed_sentences
+from doc_store import Doc_Store
+from stem_table import Stem_Table
+from topic_cache import Topic_Cache
+from parse_cache import Parse_Cache
+from content_realization import get_compressed_sentences_batch, get_annotated_sentences_batch, get_trimmed_sentences_batch, parse_sentences
 from math import log
+import numpy as np
+from scipy.sparse import csr_matrix
+from collections import Counter
 import os  # os module imported here to open multiple files at once
-import spacy
-
-spacy_parser = spacy.load('/home/longwill/en_core_web_md/en_core_web_md-2.1.0')
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import sys
+
+spacy_model_path = '/home/longwill/en_core_web_md/en_core_web_md-2.1.0'
+spacy_model = None  #### Loaded by get_spacy_model() the first time a sentence is parsed
+spacy_parse_memo = None  #### Optional dict of sentence text -> parsed Doc shared by runs that parse the same sentences, see ablation.py
+spacy_parse_cache = None  #### Optional on-disk Parse_Cache of parsed sentences shared between runs, see get_data(parse_cache_dir)
+topic_worker_settings = None  #### Settings last applied by configure_topic_worker in a worker process of iter_topics
 stop_words = set(stopwords.words('english'))
 
 
@@ -32,14 +45,31 @@ class Topic:
         self.docsetA_id=docsetA_id
         self.raw_counts = {}  ##### Used for counts across all sentences
         self.tf_norm_values= {}
+        self.doc_freq = Counter()  ##### Number of sentences containing each token, filled as sentences are created
         ############### Creates and adds title and narrative and category Sentence Objects To Topic
         self.title = Sentence.create_sentence(self, title)
         self.narrative = Sentence.create_sentence(self, narrative) ##### *** Not all topics have this attribute ***
         self.category=Sentence.create_sentence(self,category) ##### *** Not all topics have this attribute ***
+
+        #### The category is not counted when computing idf
+        if self.category:
+            self.doc_freq.subtract(self.category.raw_counts.keys())
         ##########################################################
         self.document_list=[]
         self.summary = []
         self.idf={}
+        self.compress_candidates = 0  ##### Number of top ranked sentences select_content still has to compress, see add_compressed_variants
+        self.idf_type = None  ##### Types the weights were last computed with by compute_tf_idf, so they survive a reweight
+        self.tf_type = None
+        ############### Array representation filled by build_matrices(), rows follow all_sentences() and columns follow vocabulary
+        self.vocabulary = {}  ##### token -> column index
+        self.matrix_sentences = []
+        self.raw_count_matrix = None
+        self.tf_matrix = None
+        self.tf_idf_matrix = None
+        self.tf_idf_norm_matrix = None
+        self.tf_vector = None
+        self.idf_vector = None
 
 
     #Returns list of all sentences in Topic, including Title sentence, narrative sentences, and headlines
@@ -63,22 +93,9 @@ class Topic:
         return total_sentences
 
     ##### Counts the sentences under this topic that contains a token parameter
+    # Document sentences, headlines, the title and the narrative are counted as each sentence is tokenized, so this is a lookup
     def n_containing(self, token):
-        # checks all tokens in each sentence of every document in the topic
-        count = sum(1 for document in self.document_list for sentence in document.sentence_list if
-            token in sentence)
-
-        # checks all headlines if available in every document in the topic
-        count += sum(1 for document in self.document_list if document.headline if token in document.headline)
-
-        # checks the title in the topic
-        if self.title and token in self.title:
-            count+=1
-        # checks the narrative in the topic
-        if self.narrative and token in self.narrative:
-            count+=1
-
-        return count
+        return self.doc_freq[token]
 
 
     #Take the ratio of the total number of documents to the number of documents containing any word.
@@ -116,43 +133,119 @@ class Topic:
             self.idf[token] = current_idf
             return current_idf
 
+    # Returns the idf of a token under idf_type. Falls back to smooth idf when the type is unknown or its formula fails for the token
+    def get_idf(self, token, idf_type:str):
+        try:
+            return getattr(self, 'get_' + idf_type)(token)
+        except:
+            return self.get_smooth_idf(token)
+
     # Must be used after all Documents, Sentences, and Tokens have been filled.
-    def compute_tf_idf(self):
+    # All weights are computed from the stored raw counts, so calling it again with another idf_type or tf_type
+    # reweights the topic without re-tokenizing. Types default to the class level Topic.idf_type and Topic.tf_type,
+    # and the types used are kept on the topic
+    def compute_tf_idf(self, idf_type:str=None, tf_type:str=None):
+        idf_type = idf_type or Topic.idf_type
+        tf_type = tf_type or Topic.tf_type
+        self.idf_type = idf_type
+        self.tf_type = tf_type
 
         cluster_count=sum(self.raw_counts.values())
 
+        #### Cleared so that weights of an earlier idf_type or tf_type are not reused
+        self.idf={}
+        self.tf_norm_values={}
+
         #for sentence in doc.sentence_list + [self.title, self.narrative,  doc.headline]:
         for sentence in self.all_sentences():
             if sentence:
 
-                for token in sentence.token_list:
-                    token_value=token.token_value
+                sentence.set_tf_norm_values(tf_type)
+                sentence.tf_idf={}
+                sentence.tf_idf_norm={}
 
-                    if token_value not in self.tf_norm_values.keys():
-                        raw_token_count=self.raw_counts.get(token_value)
-                        try:
-                            self.tf_norm_values.update({token_value: eval(
-                                'Sentence.get_' + Topic.tf_type + '(cluster_count=cluster_count,raw_token_count=raw_token_count)')})
-                        except:
-                            self.tf_norm_values.update({token_value: Sentence.get_term_frequency(cluster_count=cluster_count, raw_token_count=raw_token_count)})
+                for token_value, raw_count in sentence.raw_counts.items():
 
+                    if token_value not in self.tf_norm_values:
+                        self.tf_norm_values[token_value] = Sentence.get_tf_norm(cluster_count, self.raw_counts.get(token_value), tf_type)
 
-                    try:
-                        idf=eval('self.get_' + Topic.idf_type +'(token_value)')
-                    except:
-                        idf=self.get_smooth_idf(token_value)
+                    idf=self.get_idf(token_value, idf_type)
 
-                    sentence.tf_idf[token_value] = token.raw_count * idf #self.get_standard_idf(token)
+                    sentence.tf_idf[token_value] = raw_count * idf #self.get_standard_idf(token)
                     sentence.tf_idf_norm[token_value] = sentence.tf_norm_values[token_value] * idf
 
+        self.build_matrices()
+
+    # Builds sparse (sentences x terms) CSR matrices of the raw counts, tf, tf-idf and tf-idf-norm values of every sentence,
+    # and dense topic level tf and idf vectors. Each sentence stores its row in matrix_row.
+    # Must be used after compute_tf_idf has filled the sentence dictionaries
+    def build_matrices(self):
+        self.matrix_sentences = [sentence for sentence in self.all_sentences() if sentence]
+        self.vocabulary = {token: column for column, token in enumerate(sorted(self.raw_counts))}
+
+        indptr = [0]
+        indices = []
+        for row, sentence in enumerate(self.matrix_sentences):
+            sentence.matrix_row = row
+            indices.extend(self.vocabulary[token] for token in sentence.raw_counts)
+            indptr.append(len(indices))
+
+        shape = (len(self.matrix_sentences), len(self.vocabulary))
+
+        def sentence_matrix(values_name):
+            data = [value for sentence in self.matrix_sentences for value in getattr(sentence, values_name).values()]
+            return csr_matrix((np.array(data, dtype=float), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)), shape=shape)
+
+        #### raw_counts, tf_norm_values, tf_idf and tf_idf_norm are all filled in token_list order so their values line up with indices
+        self.raw_count_matrix = sentence_matrix("raw_counts")
+        self.tf_matrix = sentence_matrix("tf_norm_values")
+        self.tf_idf_matrix = sentence_matrix("tf_idf")
+        self.tf_idf_norm_matrix = sentence_matrix("tf_idf_norm")
+
+        self.tf_vector = np.array([self.tf_norm_values.get(token, 0.0) for token in self.vocabulary], dtype=float)
+        self.idf_vector = np.array([self.idf.get(token, 0.0) for token in self.vocabulary], dtype=float)
+
+    # Parses the given document sentences of a topic built with compress_candidates and adds their remove_appos, remove_advcl,
+    # remove_relcl and remove_acl variants to their documents right after them, as create_sentence_list would have.
+    # Recomputes tf-idf so the variants can be ranked with the rest of the topic
+    def add_compressed_variants(self, candidates:list):
+        self.compress_candidates = 0
+
+        if not candidates:
+            return
+
+        variants = Document.trim_sentences([sentence.original_sentence for sentence in candidates])
+        tagged_variants = iter(tag_sentences([variant for sentence_variants in variants for variant in sentence_variants]))
+
+        #### Keyed by id since Sentence equality compares scores
+        variant_sentences = {}
+        for sentence, sentence_variants in zip(candidates, variants):
+            variant_sentences[id(sentence)] = [Sentence(sentence.parent_doc, variant, next(tagged_variants)) for variant in sentence_variants]
+
+        for document in {id(sentence.parent_doc): sentence.parent_doc for sentence in candidates}.values():
+            document.sentence_list = [listed for sentence in document.sentence_list for listed in [sentence] + variant_sentences.get(id(sentence), [])]
+
+            for index, sentence in enumerate(document.sentence_list):
+                sentence.index = index
+
+        save_parse_cache()
+
+        #### Keeps the weighting of a topic that was reweighted after it was built
+        self.compute_tf_idf(self.idf_type, self.tf_type)
+
 class Document:
-    def __init__(self, parent_topic:Topic=None , doc_id:str=None, headline:str=None,date:str=None, category:str=None, document_text:str=None):
+    spacy_annotation=False  #### True takes tokens and POS tags from the compression parse instead of NLTK
+    compress_candidates=0  #### More than 0 leaves clause removal to select_content, for only this many top ranked sentences of each topic
+    prefilter_compression=False  #### True only parses sentences that content_realization.could_trim finds a clause cue in
+    parse_batch_size=1000  #### Sentences spaCy parses together in nlp.pipe during compression
+    parse_processes=1  #### Processes nlp.pipe parses with, more than 1 needs spaCy 2.2 or later
+    def __init__(self, parent_topic:Topic=None , doc_id:str=None, headline:str=None,date:str=None, category:str=None, document_text:str=None, compressed_sentences:list=None):
         self.parent_topic = parent_topic
         self.sent_count = 0
         self.doc_id=doc_id
         self.date=date
         self.category=category ##### *** Not all topics have this attribute ***
-        self.sentence_list = self.create_sentence_list(document_text)
+        self.sentence_list = self.create_sentence_list(document_text, compressed_sentences)
         ############### Creates and adds headline Sentence Objects To Topic
         self.headline = Sentence.create_sentence(self,headline) ##### *** Not all topics have this attribute ***
 
@@ -165,41 +258,78 @@ class Document:
     def __lt__(self, other):
         return (self.date < other.date)
 
+    # Compresses a list of source sentences, parsing all of them with one batched nlp.pipe call.
+    # Returns one list of compressed variants per source sentence. With spacy_annotation the variants are
+    # (sentence, tagged_sent, lemmas) tuples, otherwise sentence strings
+    @classmethod
+    def compress_sentences(cls, source_sentences:list)->list:
+        #### Only cleaned here, nothing is parsed until select_content picks the candidates
+        if Document.compress_candidates:
+            return get_compressed_sentences_batch(source_sentences, spacy_parser, Document.remove_header, Document.remove_parens, Document.remove_quotes, False, False, False, False)
+
+        if Document.spacy_annotation:
+            return get_annotated_sentences_batch(source_sentences, spacy_parser, Document.remove_header, Document.remove_parens, Document.remove_quotes, Document.remove_appos, Document.remove_advcl, Document.remove_relcl, Document.remove_acl, Document.parse_batch_size, Document.parse_processes)
+
+        return get_compressed_sentences_batch(source_sentences, spacy_parser, Document.remove_header, Document.remove_parens, Document.remove_quotes, Document.remove_appos, Document.remove_advcl, Document.remove_relcl, Document.remove_acl, Document.parse_batch_size, Document.parse_processes, Document.prefilter_compression)
+
+    # Parses a list of clean sentences with one batched nlp.pipe call and returns the list of their trimmed variants
+    # for the enabled remove_appos, remove_advcl, remove_relcl and remove_acl rules, see Topic.add_compressed_variants
+    @classmethod
+    def trim_sentences(cls, clean_sentences:list)->list:
+        return get_trimmed_sentences_batch(clean_sentences, spacy_parser, Document.remove_appos, Document.remove_advcl, Document.remove_relcl, Document.remove_acl, Document.parse_batch_size, Document.parse_processes, Document.prefilter_compression)
+
     # Takes Document object and the text from doc file. The block of text is separated into sentences as sentence objects and also tokenized using NLTK.
-    def create_sentence_list(self, doc_text)->list:
+    # All sentences of the document are POS tagged in one batch before the Sentence objects are created,
+    # or with spacy_annotation the spaCy parse made for compression supplies the tokens and tags of each sentence.
+    # compressed_sentences is an optional result of compress_sentences for the sentences of doc_text, so that build_topic can compress a whole topic in one batch
+    def create_sentence_list(self, doc_text, compressed_sentences:list=None)->list:
         sentence_list=[]
 
-        for doc_sentence in sent_tokenize(doc_text):
+        # Get compressed versions of the original sentences
+        if compressed_sentences is None:
+            compressed_sentences = Document.compress_sentences(sent_tokenize(doc_text))
 
-            # Get compressed versions of the original sentence
-            compressed_sentences = get_compressed_sentences(doc_sentence, spacy_parser, Document.remove_header, Document.remove_parens, Document.remove_quotes, Document.remove_appos, Document.remove_advcl, Document.remove_relcl, Document.remove_acl)
-            # Add a sentence object for each compressed sentence
-            for sent in compressed_sentences:
+        if Document.spacy_annotation and not Document.compress_candidates:
+            annotated_sentences = [variant for sentence_variants in compressed_sentences for variant in sentence_variants]
+            sentence_texts = [sent for sent, tagged_sent, lemmas in annotated_sentences]
+            tagged_sents = [tagged_sent for sent, tagged_sent, lemmas in annotated_sentences]
+        else:
+            sentence_texts = [sent for sentence_variants in compressed_sentences for sent in sentence_variants]
+            tagged_sents = tag_sentences(sentence_texts)
+
+        # Add a sentence object for each compressed sentence
+        for sent, tagged_sent in zip(sentence_texts, tagged_sents):
 
-                current_sentence=Sentence(self, sent)  #Creates sentence object
-                current_sentence.index=len(sentence_list)
-                sentence_list.append(current_sentence)
+            current_sentence=Sentence(self, sent, tagged_sent)  #Creates sentence object
+            current_sentence.index=len(sentence_list)
+            sentence_list.append(current_sentence)
 
         return sentence_list
 
 #All sentences are part of a document of either Topic or Document type
 class Sentence:
-    ps = PorterStemmer()
+    #### Slots keep per-sentence memory small, since every source sentence has up to five compressed variants
+    __slots__ = ('score', 'parent_doc', 'original_sentence', 'nouns', 'sent_len', 'token_count', 'raw_counts', 'tf_norm_values', 'tf_idf', 'tf_idf_norm', 'matrix_row', 'index')
+
+    stem_table = Stem_Table()  #### Process-wide memo of Porter stems, see stem_table.stats() for hit rates
 
     stemming=False
     lower=False
 
-    def __init__(self,parent_doc:Document or Topic, original_sentence:str):
+    # tagged_sent is an optional list of (token, POS) pairs of the sentence from tag_sentences, otherwise the sentence is tagged here
+    def __init__(self,parent_doc:Document or Topic, original_sentence:str, tagged_sent:list=None):
         self.score=0
         self.parent_doc=parent_doc
-        self.original_sentence = original_sentence.replace("\n", " ").strip().replace("  ", " ")
+        self.original_sentence = Sentence.normalize(original_sentence)
         self.nouns=set()
         self.sent_len = original_sentence.count(" ") + 1   #Counts words in original sentence
-        self.raw_counts = {}
+        self.token_count = 0  ##### Number of tokens in the sentence including duplicates and stop words, the tf denominator
+        self.raw_counts = {}  ##### *** One key per non-duplicate token, Token objects are only made on request by token_list ***
         self.tf_norm_values={}
-        self.token_list=self.create_token_list(self.original_sentence)  ##### *** List of non-duplicate Tokens as Objects ***
+        self.create_token_list(self.original_sentence, tagged_sent)
         self.tf_idf={}
         self.tf_idf_norm={}
+        self.matrix_row = -1  ##### Row of this sentence in the parent Topic's matrices, set by Topic.build_matrices()
 
         # Increments parent count when initialized. If parent_doc is Document, then Topic sent_count is also incremented
         self.parent_doc.sent_count+=1
@@ -215,8 +345,19 @@ class Sentence:
     def __eq__(self, other):
         return (self.score == other.score)
     # allows the use of 'is' operator on Sentence object
+    # raw_counts has exactly one key per token in token_list
     def __contains__(self, param):
-        return any(token.token_value == param for token in self.token_list)
+        return param in self.raw_counts
+
+    # Removes newlines and double spaces from sentence text
+    @classmethod
+    def normalize(cls, original_sentence:str)->str:
+        return original_sentence.replace("\n", " ").strip().replace("  ", " ")
+
+    # List of non-duplicate Tokens as Objects, built from raw_counts and tf_norm_values when asked for
+    @property
+    def token_list(self)->list:
+        return [Token(token, raw_count, self.tf_norm_values[token]) for token, raw_count in self.raw_counts.items()]
 
     ### Wrapper initializer that includes validation
     @classmethod
@@ -227,6 +368,18 @@ class Sentence:
             sentence = None
         return sentence
 
+    # Returns the tf of a token under tf_type. Falls back to term frequency when the type is unknown
+    @classmethod
+    def get_tf_norm(cls, cluster_count, raw_token_count, tf_type:str):
+        try:
+            return getattr(Sentence, 'get_' + tf_type)(cluster_count=cluster_count, raw_token_count=raw_token_count)
+        except:
+            return Sentence.get_term_frequency(cluster_count, raw_token_count)
+
+    # Recomputes tf_norm_values from the stored raw counts, in raw_counts order
+    def set_tf_norm_values(self, tf_type:str):
+        self.tf_norm_values = {token: Sentence.get_tf_norm(self.token_count, raw_count, tf_type) for token, raw_count in self.raw_counts.items()}
+
     @classmethod
     def get_term_frequency(cls,cluster_count,raw_token_count):
         return raw_token_count / cluster_count
@@ -243,46 +396,46 @@ class Sentence:
 
 
 
-    # Tokenizes a sentences and populates the sentence object with a token object list
-    def create_token_list(self, original_sentence: str)->list:
+    # Tokenizes a sentences and populates the sentence object's raw_counts for each non-duplicate token and its tf_norm_values under Topic.tf_type
+    def create_token_list(self, original_sentence: str, tagged_sent:list=None):
 
         # Edits the original sentence to remove article formatting
         # This location was chosen so that all sentences that are tokenized (i.e., Title sentence) could also be effected by this
-        token_list = []
 
         '''LOTS OF TOKEN LOOPING WITHIN SENT REQUIRED BECAUSE OF POS TAGGING'''
         #Tokenize sentence
-        tokenized_sent = word_tokenize(original_sentence)
-
         #Must tokenize sentence before pos tagging
+        if tagged_sent is None:
+            tagged_sent = pos_tag(word_tokenize(original_sentence))
+
+        tokenized_sent = [token for token, pos in tagged_sent]
+
         #Captures only Nouns and adds to self.nouns set
-        [self.nouns.add(token) for token,pos in pos_tag(tokenized_sent) if 'NN' in pos]
+        [self.nouns.add(token) for token,pos in tagged_sent if 'NN' in pos]
 
         #Lowercasing before pos tagging affects tags, so must do after as list
         if Sentence.lower:
             tokenized_sent = [token.lower() for token in tokenized_sent]
 
         #Can only stem one word at a time, can't stem whole sentence
+        #### Tokens from the spaCy parse are stemmed too, so they share a vocabulary with titles, narratives and headlines
         if Sentence.stemming:  ##### THe stemmer also lowercases
-            tokenized_sent = [Sentence.ps.stem(token) for token in tokenized_sent]
+            tokenized_sent = [Sentence.stem_table.stem(token) for token in tokenized_sent]
+
+        self.token_count = len(tokenized_sent)
 
         for token in set(tokenized_sent):
             ''''######### Removes stop words #########'''''
             if token not in stop_words:
 
+                #### Interned so every sentence shares one copy of each token string
+                token = sys.intern(token)
+
                 raw_token_count = Sentence.get_raw_count(tokenized_sent, token)
 
                 #Adds raw count to sentence
                 self.raw_counts.update({token:raw_token_count})
 
-                try:
-                    tf_norm = eval('Sentence.get_' + Topic.tf_type + '(cluster_count=len(tokenized_sent),raw_token_count=raw_token_count)')
-                except:
-                    tf_norm = Sentence.get_term_frequency(len(tokenized_sent), raw_token_count)
-
-                #Adds normalalized tf to sentence
-                self.tf_norm_values.update({token: tf_norm})
-
                 ##### Adds tokens raw counts to Parent Topic
                 if type(self.parent_doc)==Topic:
                     current_topic=self.parent_doc
@@ -290,22 +443,94 @@ class Sentence:
                     current_topic=self.parent_doc.parent_topic
 
                 current_topic.raw_counts.update({token: current_topic.raw_counts.get(token,0)+raw_token_count})
+                current_topic.doc_freq[token] += 1
                 ###############################################
 
-                token_list.append(Token(self, token, raw_token_count ,tf_norm))
-
-        return token_list
+        #Adds normalalized tf to sentence
+        self.set_tf_norm_values(Topic.tf_type)
 
 
+#### Lightweight view of one token of a Sentence, see Sentence.token_list
 class Token:
-    def __init__(self,parent_sentence:Sentence, token_value:str, raw_count, tf_norm):
+    __slots__ = ('raw_count', 'tf_norm', 'token_value')
+
+    def __init__(self, token_value:str, raw_count, tf_norm):
         self.raw_count=raw_count
         self.tf_norm=tf_norm
-        self.parent_sentence=parent_sentence
         self.token_value=token_value
     def __repr__(self):
         return self.token_value
 
+# Loads the spaCy model on first use, with only the tagger and parser that compression needs.
+# spaCy itself is imported here so that importing data_input does not pay for it
+def get_spacy_model():
+    global spacy_model
+
+    if spacy_model is None:
+        import spacy
+        spacy_model = spacy.load(spacy_model_path, disable=["ner"])
+
+    return spacy_model
+
+# Returns the "<lang>_<name>-<version>" of the spaCy model, read from its meta.json so that the model is not loaded for it
+def get_spacy_model_name()->str:
+    import spacy
+
+    if os.path.isdir(spacy_model_path):
+        meta = spacy.util.get_model_meta(spacy_model_path)
+    else:
+        meta = get_spacy_model().meta
+
+    return "{}_{}-{}".format(meta["lang"], meta["name"], meta["version"])
+
+# Passed to content_realization in place of the spaCy model, so that the model is never loaded when no sentence
+# needs parsing (every remove_* clause flag off, or every parse in spacy_parse_cache).
+# Parses are shared through spacy_parse_memo and spacy_parse_cache when they are set
+class Spacy_Parser:
+
+    # Parses one sentence
+    def __call__(self, sentence:str):
+        if spacy_parse_memo is None and spacy_parse_cache is None:
+            return get_spacy_model()(sentence)
+
+        return self.pipe([sentence])[0]
+
+    # Parses a list of sentences with nlp.pipe, the same as the spaCy model's pipe. Returns a list of Docs
+    def pipe(self, sentences:list, batch_size:int=1000, n_process:int=1)->list:
+        if spacy_parse_memo is None:
+            return self.parse(sentences, batch_size, n_process)
+
+        #### Only sentences not parsed before are sent to spaCy, each once
+        missing = [sentence for sentence in dict.fromkeys(sentences) if sentence not in spacy_parse_memo]
+        spacy_parse_memo.update(zip(missing, self.parse(missing, batch_size, n_process)))
+
+        return [spacy_parse_memo[sentence] for sentence in sentences]
+
+    # Parses a list of sentences with the spaCy model, or takes them from spacy_parse_cache when it is set
+    def parse(self, sentences:list, batch_size:int, n_process:int)->list:
+        if spacy_parse_cache is None:
+            return parse_sentences(sentences, get_spacy_model(), batch_size, n_process)
+
+        return spacy_parse_cache.pipe(sentences, get_spacy_model, batch_size, n_process)
+
+# Writes the parses made since the last save to spacy_parse_cache, when it is set
+def save_parse_cache():
+    if spacy_parse_cache is not None:
+        spacy_parse_cache.save()
+
+# Returns the entries, hits, misses and hit rate of spacy_parse_cache in this process, or None when no cache is set
+def get_parse_cache_stats():
+    if spacy_parse_cache is not None:
+        return spacy_parse_cache.stats()
+    return None
+
+spacy_parser = Spacy_Parser()
+
+# Tokenizes a list of sentence strings and POS tags all of them with a single tagger call.
+# Returns a list of (token, POS) pair lists in the same order, for passing to Sentence
+def tag_sentences(sentences:list)->list:
+    return pos_tag_sents([word_tokenize(Sentence.normalize(sentence)) for sentence in sentences])
+
 ###############################
 ### Tag Variables used to avoid hardcoding later in the document or in case of tag changes
 
@@ -323,7 +548,7 @@ headline_tag='headline'
 ###############################
 
 # Takes a file path, collects all data and stores into a list of class object 'Topic' data structures
-def get_data(file_path:str, stemming:bool, lower:bool, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl)->list:
+def get_data(file_path:str, stemming:bool, lower:bool, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, doc_index_path:str=None, cache_max_entries:int=None, cache_max_bytes:int=None, streaming:bool=False, batch_retrieval:bool=True, prefetch_workers:int=0, prefetch_lookahead:int=2, corpus_root:str=document_retriever.default_corpus_root, doc_store_path:str=None, spacy_annotation:bool=False, stem_table_path:str=None, topic_workers:int=0, topic_cache_dir:str=None, parse_batch_size:int=1000, parse_processes:int=1, compress_candidates:int=0, parse_cache_dir:str=None, prefilter_compression:bool=False)->list:
     """Extracts database documents and creates data structure objects to hold them. Returns a list of Topic objects
 
     Args:
@@ -339,22 +564,89 @@ def get_data(file_path:str, stemming:bool, lower:bool, idf_type, tf_type, remove
         remove_advcl: True if adverbial clause modifier should be removed from the sentence
         remove_relcl: True if relative clause modifier should be removed from the sentence
         remove_acl: True if a finite or non-finite clausal modifier shoule be removed from the sentence
+        doc_index_path:str optional path of the on-disk doc offset index used by the Document_Retriever, None disables the index
+        cache_max_entries:int maximum number of parsed corpus files kept in the Document_Retriever cache, None for no limit
+        cache_max_bytes:int maximum estimated memory in bytes (about 3x the uncompressed file size) of parsed corpus files kept in the Document_Retriever cache, None for no limit
+        streaming:bool True extracts each document by streaming its corpus file instead of parsing and caching the whole file
+        batch_retrieval:bool True retrieves all documents of the topics file up front, reading each corpus file once. False retrieves them one at a time
+        prefetch_workers:int number of background threads reading corpus files ahead of topic processing, 0 disables prefetching
+        prefetch_lookahead:int number of topics ahead of the current one whose corpus files may be read by the prefetch threads
+        corpus_root:str directory holding the LDC02T31, LDC08T25 and LDC11T07 corpora
+        doc_store_path:str optional path of a SQLite store of extracted documents. Stored documents skip the corpus entirely, None disables the store
+        spacy_annotation:bool True takes the tokens and POS tags of document sentences from the spaCy parse used for compression instead of tokenizing and tagging them again with NLTK
+        stem_table_path:str optional path of a JSON file the memoized Porter stems are loaded from and saved back to, None keeps the table in memory only
+        topic_workers:int number of worker processes that build topics (compression, tokenization and tf-idf) in parallel, 0 builds them one at a time in this process
+        topic_cache_dir:str optional directory of cached topic lists keyed by the topics file contents, the preprocessing settings, corpus_root, doc_store_path and the spaCy model version. A repeat run with the same input and preprocessing loads its topics from here, None disables the cache
+        parse_batch_size:int number of sentences spaCy parses together with nlp.pipe during compression
+        parse_processes:int number of processes nlp.pipe parses with during compression. More than 1 needs spaCy 2.2 or later and should not be combined with topic_workers
+        prefilter_compression:bool True only parses the clean sentences in which content_realization.could_trim finds a cue for an enabled remove_appos, remove_advcl, remove_relcl or remove_acl rule, the others are kept untrimmed. Not used with spacy_annotation, which parses every sentence
+        parse_cache_dir:str optional directory of spaCy parses of clean sentences kept between runs, one subdirectory per spaCy model name and version. Cached sentences are not parsed again, None disables the cache
+        compress_candidates:int number of top ranked sentences of each topic that select_content parses and compresses with the remove_appos, remove_advcl, remove_relcl and remove_acl rules, after ranking the cleaned sentences without them. 0 compresses every sentence here. Sentences are then tokenized and tagged with NLTK even with spacy_annotation
 
     """
 
     # Set all the hyperparamaters
-    configure_class_objects(stemming, lower, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl)
+    configure_class_objects(stemming, lower, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, spacy_annotation, compress_candidates, prefilter_compression)
+
+    #### Also set for cached topics, since select_content still parses their candidates when compress_candidates is set
+    configure_parsing(stem_table_path, parse_batch_size, parse_processes, parse_cache_dir)
+
+    # Topics built before from the same input with the same preprocessing are loaded instead of rebuilt
+    if topic_cache_dir:
+        topic_cache = Topic_Cache(topic_cache_dir)
+        #### Documents come from the corpus or the doc store, and the spaCy model version only matters when sentences are parsed
+        parses_sentences = spacy_annotation or remove_appos or remove_advcl or remove_relcl or remove_acl
+        sources = (os.path.abspath(corpus_root), os.path.abspath(doc_store_path) if doc_store_path else None, get_spacy_model_name() if parses_sentences else None)
+        cache_key = Topic_Cache.make_key([file_path, file_path.rsplit("/",maxsplit=1)[0] + categories_file_tag], get_class_configuration() + sources)
+        topics = topic_cache.get(cache_key)
+        if topics is not None:
+            return topics
+
+    topics = list(iter_data(file_path, stemming, lower, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, doc_index_path, cache_max_entries, cache_max_bytes, streaming, batch_retrieval, prefetch_workers, prefetch_lookahead, corpus_root, doc_store_path, spacy_annotation, stem_table_path, topic_workers, parse_batch_size, parse_processes, compress_candidates, parse_cache_dir, prefilter_compression))
+
+    if topic_cache_dir:
+        topic_cache.put(cache_key, topics)
+
+    return topics
+
+# Same as get_data, but yields each Topic as soon as it is built instead of returning the list, so a caller that handles
+# one topic at a time only keeps the topics it has not finished with. Takes the arguments of get_data except topic_cache_dir
+def iter_data(file_path:str, stemming:bool, lower:bool, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, doc_index_path:str=None, cache_max_entries:int=None, cache_max_bytes:int=None, streaming:bool=False, batch_retrieval:bool=True, prefetch_workers:int=0, prefetch_lookahead:int=2, corpus_root:str=document_retriever.default_corpus_root, doc_store_path:str=None, spacy_annotation:bool=False, stem_table_path:str=None, topic_workers:int=0, parse_batch_size:int=1000, parse_processes:int=1, compress_candidates:int=0, parse_cache_dir:str=None, prefilter_compression:bool=False):
+
+    # Set all the hyperparamaters
+    configure_class_objects(stemming, lower, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, spacy_annotation, compress_candidates, prefilter_compression)
+
+    raw_topics = get_raw_topics(file_path)
+
+    configure_parsing(stem_table_path, parse_batch_size, parse_processes, parse_cache_dir)
+
+    #### The stem table is also saved when the caller stops early or a topic fails
+    try:
+        yield from iter_topics(raw_topics, get_categories(file_path), doc_index_path, cache_max_entries, cache_max_bytes, streaming, batch_retrieval, prefetch_workers, prefetch_lookahead, corpus_root, doc_store_path, topic_workers)
+    finally:
+        Sentence.stem_table.save()
 
+# Parses the topics file and returns its topic elements
+def get_raw_topics(file_path:str)->list:
     with open(file_path) as f1:
         task_data = f1.read()
 
         soup = BeautifulSoup(task_data, parser_tag)
-        raw_topics = soup.findAll(topic_tag)
+        return soup.findAll(topic_tag)
 
-    return get_topics_list(raw_topics, get_categories(file_path))
+# Sets the stem table, the nlp.pipe batching and the parse cache used when sentences are stemmed and parsed, see get_data
+def configure_parsing(stem_table_path:str=None, parse_batch_size:int=1000, parse_processes:int=1, parse_cache_dir:str=None):
+    Document.parse_batch_size = parse_batch_size
+    Document.parse_processes = parse_processes
+
+    #### The table is kept across get_data calls in one process unless a different file is asked for
+    if stem_table_path and Sentence.stem_table.table_path != stem_table_path:
+        Sentence.stem_table = Stem_Table(stem_table_path)
+
+    set_parse_cache(parse_cache_dir)
 
 # unary_idf smooth_idf standard_idf probabilistic_idf
-def configure_class_objects(stemming:bool,lower:bool, idf_type:str, tf_type:str, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl):
+def configure_class_objects(stemming:bool,lower:bool, idf_type:str, tf_type:str, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, spacy_annotation:bool=False, compress_candidates:int=0, prefilter_compression:bool=False):
 
     if stemming:
         Sentence.stemming = stemming
@@ -372,6 +664,9 @@ def configure_class_objects(stemming:bool,lower:bool, idf_type:str, tf_type:str,
     Document.remove_advcl = remove_advcl
     Document.remove_relcl = remove_relcl
     Document.remove_acl = remove_acl
+    Document.spacy_annotation = spacy_annotation
+    Document.compress_candidates = compress_candidates
+    Document.prefilter_compression = prefilter_compression
 
 def get_categories(file_path:str):
 
@@ -395,22 +690,146 @@ def get_categories(file_path:str):
         return None
 
 
-#Takes a Topic class object, an xml or html document set element, and a document retriever object
+#Takes an xml or html document set element and a document retriever object
 # Itterates all document Id's in html/xml element and uses the doc retriever to get the raw document from database
-#Extracts attributes from raw document and creates Document class object, fills it with sentence objects and adds it to the current topic object
-def populate_document_list(current_topic, docsetA, doc_ret:document_retriever.Document_Retriever):
+# If raw_docs from Document_Retriever.retrieve_docs is given, documents are taken from it instead and released after their last use
+# If a doc_store is given, previously extracted documents are read from it and newly extracted ones are added to it
+# Yields the (doc_id, date, headline, category, doc_text) of each document as plain strings, so they can also be sent to a worker process
+def extract_doc_attributes(docsetA, doc_ret:document_retriever.Document_Retriever, raw_docs:dict=None, remaining_uses:Counter=None, doc_store:Doc_Store=None):
 
     for doc in docsetA.findAll(doc_tag):
 
         doc_id = doc.attrs[id_tag]
+        stored = None
+
+        if raw_docs is not None and doc_id in raw_docs:
+            doc_ret.configure(doc_id)  #### Sets the date and tags for this document
+            raw_doc = raw_docs[doc_id]
 
-        raw_doc = doc_ret.retrieve_doc(doc_id)
-        headline, category, dateline, doc_text = get_doc_attributes(raw_doc, doc_ret.headline_tag, doc_ret.category_tag, doc_ret.dateline_tag, doc_ret.text_tag)
+            #### The same document can be used by several topics, so it is only released after the last one
+            remaining_uses[doc_id] -= 1
+            if remaining_uses[doc_id] == 0:
+                del raw_docs[doc_id]
 
-        current_doc = Document(parent_topic=current_topic, doc_id=doc_id, date=doc_ret.date,headline=headline, category=category, document_text=doc_text)  ########## Creates document object
+        else:
+            stored = doc_store.get(doc_id) if doc_store else None
+
+            if stored:
+                doc_ret.configure(doc_id)  #### Only the date is needed, the corpus file is never opened
+            else:
+                raw_doc = doc_ret.retrieve_doc(doc_id)
+
+        if stored:
+            headline, category, dateline, doc_text = stored
+        else:
+            headline, category, dateline, doc_text = get_doc_attributes(raw_doc, doc_ret.headline_tag, doc_ret.category_tag, doc_ret.dateline_tag, doc_ret.text_tag)
+
+            if doc_store:
+                doc_store.put(doc_id, headline, category, dateline, doc_text)
+
+        yield doc_id, doc_ret.date, headline, category, doc_text
+
+#Takes a Topic class object, an xml or html document set element, and a document retriever object
+#Extracts attributes from raw document and creates Document class object, fills it with sentence objects and adds it to the current topic object
+def populate_document_list(current_topic, docsetA, doc_ret:document_retriever.Document_Retriever, raw_docs:dict=None, remaining_uses:Counter=None, doc_store:Doc_Store=None):
+
+    for doc_id, date, headline, category, doc_text in extract_doc_attributes(docsetA, doc_ret, raw_docs, remaining_uses, doc_store):
+
+        current_doc = Document(parent_topic=current_topic, doc_id=doc_id, date=date,headline=headline, category=category, document_text=doc_text)  ########## Creates document object
 
         current_topic.document_list.append(current_doc)
 
+# Creates a Topic object from its attributes and the extracted attributes of its documents, fills it with Document objects and computes tf-idf.
+# Only takes plain strings so it can run in a worker process, see get_topics_list
+def build_topic(topic_attributes:tuple, doc_attributes:list)->Topic:
+    topic_id, docsetA_id, title, narrative, topic_category = topic_attributes
+
+    current_topic= Topic(topic_id = topic_id,docsetA_id = docsetA_id, title = title, narrative = narrative, category=topic_category) ########### Creates topic object
+
+    # Compresses the sentences of every document together so spaCy parses the whole topic in batches
+    doc_sentences = [sent_tokenize(doc_text) for doc_id, date, headline, category, doc_text in doc_attributes]
+    compressed_sentences = Document.compress_sentences([sentence for sentences in doc_sentences for sentence in sentences])
+    start = 0
+
+    for (doc_id, date, headline, category, doc_text), sentences in zip(doc_attributes, doc_sentences):
+
+        current_doc = Document(parent_topic=current_topic, doc_id=doc_id, date=date,headline=headline, category=category, document_text=doc_text, compressed_sentences=compressed_sentences[start:start + len(sentences)])  ########## Creates document object
+        start += len(sentences)
+
+        current_topic.document_list.append(current_doc)
+
+    current_topic.compute_tf_idf()
+
+    #### Saved for every topic, since worker processes building topics have no other point to save at
+    save_parse_cache()
+
+    #### Left for select_content when there are clauses to remove
+    if Document.remove_appos or Document.remove_advcl or Document.remove_relcl or Document.remove_acl:
+        current_topic.compress_candidates = Document.compress_candidates
+
+    return current_topic
+
+# Recomputes the tf and idf weights of a built topic under another idf_type and tf_type from its stored raw counts,
+# so weighting schemes can be compared without running get_data again. Returns the same topic
+def reweight(topic:Topic, idf_type:str, tf_type:str)->Topic:
+    topic.compute_tf_idf(idf_type, tf_type)
+    return topic
+
+# Returns the class level preprocessing settings set by configure_class_objects, in its argument order
+def get_class_configuration()->tuple:
+    return (Sentence.stemming, Sentence.lower, Topic.idf_type, Topic.tf_type, Document.remove_header, Document.remove_parens, Document.remove_quotes, Document.remove_appos, Document.remove_advcl, Document.remove_relcl, Document.remove_acl, Document.spacy_annotation, Document.compress_candidates, Document.prefilter_compression)
+
+# Opens the Parse_Cache of parse_cache_dir as spacy_parse_cache, keeping the open one if it is for the same directory.
+# None closes the cache
+def set_parse_cache(parse_cache_dir:str=None):
+    global spacy_parse_cache
+
+    if not parse_cache_dir:
+        spacy_parse_cache = None
+    elif spacy_parse_cache is None or spacy_parse_cache.cache_root != parse_cache_dir:
+        spacy_parse_cache = Parse_Cache(parse_cache_dir, get_spacy_model_name())
+
+# Returns what a worker process of iter_topics needs to build topics like this process: the class level preprocessing
+# settings, the parse batching, the parse cache directory and the stem table file
+def get_topic_worker_settings()->tuple:
+    parse_cache_dir = spacy_parse_cache.cache_root if spacy_parse_cache is not None else None
+    return (get_class_configuration(), Document.parse_batch_size, Document.parse_processes, parse_cache_dir, Sentence.stem_table.table_path)
+
+# Applies the settings from get_topic_worker_settings in a worker process, once per process unless they change.
+# They are sent with every task, since the ProcessPoolExecutor of Python 3.6 has no initializer.
+# Loads the spaCy model up front if compression or annotation will parse sentences that are not cached
+def configure_topic_worker(worker_settings:tuple):
+    global topic_worker_settings
+
+    if worker_settings == topic_worker_settings:
+        return
+
+    class_configuration, parse_batch_size, parse_processes, parse_cache_dir, stem_table_path = worker_settings
+    configure_class_objects(*class_configuration)
+    configure_parsing(None, parse_batch_size, parse_processes, parse_cache_dir)
+
+    #### Only the parent saves the table, with the new stems each topic sends back
+    Sentence.stem_table = Stem_Table(stem_table_path)
+    Sentence.stem_table.track_new_stems()
+
+    topic_worker_settings = worker_settings
+
+    if spacy_parse_cache is None and (Document.remove_appos or Document.remove_advcl or Document.remove_relcl or Document.remove_acl or Document.spacy_annotation):
+        get_spacy_model()
+
+# Builds a topic in a worker process of iter_topics with the settings of the parent process.
+# Returns the topic and the stems the worker added while building it, for the parent's stem table
+def build_topic_in_worker(worker_settings:tuple, topic_attributes:tuple, doc_attributes:list)->tuple:
+    configure_topic_worker(worker_settings)
+    topic = build_topic(topic_attributes, doc_attributes)
+    return topic, Sentence.stem_table.pop_new_stems()
+
+# Waits for a topic built by build_topic_in_worker and adds its new stems to this process's stem table, so they are saved with it
+def get_worker_topic(future)->Topic:
+    topic, new_stems = future.result()
+    Sentence.stem_table.update(new_stems)
+    return topic
+
 # Takes the raw topic xml/html and a set of title, narrative, and docset TAGS according to the format of file
 # extracts the respective text including document IDs for Aqcuaint(2) database
 def get_topic_attributes(raw_topic, title_tag:str , narrative_tag:str, topic_category_tag:str, docsetA_tag:str):
@@ -483,25 +902,97 @@ def get_doc_attributes(raw_doc, headline_tag:str="", category_tag:str="", dateli
 #Parses Raw data XML file argument and extracts the topic elements.
 # Creates Topic elements and fills withtopic attributes and Document objects
 # Returns these topic objects as a list.
-def get_topics_list(raw_topics, topic_categories)->list:
-    topics=[]
-    doc_ret = document_retriever.Document_Retriever()
+def get_topics_list(raw_topics, topic_categories, doc_index_path:str=None, cache_max_entries:int=None, cache_max_bytes:int=None, streaming:bool=False, batch_retrieval:bool=True, prefetch_workers:int=0, prefetch_lookahead:int=2, corpus_root:str=document_retriever.default_corpus_root, doc_store_path:str=None, topic_workers:int=0)->list:
+    return list(iter_topics(raw_topics, topic_categories, doc_index_path, cache_max_entries, cache_max_bytes, streaming, batch_retrieval, prefetch_workers, prefetch_lookahead, corpus_root, doc_store_path, topic_workers))
+
+# Same as get_topics_list, but yields each Topic in input order as soon as it is built.
+# The retriever, prefetch threads, worker processes and doc store are closed when the generator finishes or is closed
+def iter_topics(raw_topics, topic_categories, doc_index_path:str=None, cache_max_entries:int=None, cache_max_bytes:int=None, streaming:bool=False, batch_retrieval:bool=True, prefetch_workers:int=0, prefetch_lookahead:int=2, corpus_root:str=document_retriever.default_corpus_root, doc_store_path:str=None, topic_workers:int=0):
+    topic_attributes_list = iter_topic_attributes(raw_topics, topic_categories, doc_index_path, cache_max_entries, cache_max_bytes, streaming, batch_retrieval, prefetch_workers, prefetch_lookahead, corpus_root, doc_store_path)
+
+    # Builds topics in worker processes while this process keeps retrieving documents. Each worker loads spaCy once
+    topic_pool = None
+    pending_topics = deque()  #### Futures of submitted topics in input order
+    if topic_workers:
+        topic_pool = ProcessPoolExecutor(max_workers=topic_workers)
+        worker_settings = get_topic_worker_settings()
 
-    for raw_topic in raw_topics:
-        topic_id, title, narrative, docsetA_id, docsetA, topic_category = get_topic_attributes(raw_topic, title_tag, narrative_tag,topic_category_tag, docsetA_tag)
+    try:
+        for topic_attributes, doc_attributes in topic_attributes_list:
+
+            if topic_pool:
+                pending_topics.append(topic_pool.submit(build_topic_in_worker, worker_settings, topic_attributes, doc_attributes))
+
+                #### Keeps at most two topics per worker in flight so finished topics don't pile up unconsumed
+                if len(pending_topics) > 2 * topic_workers:
+                    yield get_worker_topic(pending_topics.popleft())
+            else:
+                yield build_topic(topic_attributes, doc_attributes)
+
+        while pending_topics:
+            yield get_worker_topic(pending_topics.popleft())
+
+    finally:
+        if topic_pool:
+            #### Topics not yet started are dropped if the caller stopped early
+            for future in pending_topics:
+                future.cancel()
+            topic_pool.shutdown()
+
+        topic_attributes_list.close()
+
+# Retrieves the documents of each topic and yields the (topic_attributes, doc_attributes) that build_topic takes, in input order.
+# The retriever, prefetch threads and doc store are closed when the generator finishes or is closed
+def iter_topic_attributes(raw_topics, topic_categories, doc_index_path:str=None, cache_max_entries:int=None, cache_max_bytes:int=None, streaming:bool=False, batch_retrieval:bool=True, prefetch_workers:int=0, prefetch_lookahead:int=2, corpus_root:str=document_retriever.default_corpus_root, doc_store_path:str=None):
+    doc_ret = document_retriever.Document_Retriever(index_path=doc_index_path, cache_max_entries=cache_max_entries, cache_max_bytes=cache_max_bytes, streaming=streaming, corpus_root=corpus_root)
+
+    raw_docs = None
+    remaining_uses = None
+    prefetcher = None
+    doc_store = None
+    topic_doc_ids = [[doc.attrs[id_tag] for doc in raw_topic.find(docsetA_tag).findAll(doc_tag)] for raw_topic in raw_topics]
+
+    # Documents already in the store are never retrieved from the corpus
+    if doc_store_path:
+        doc_store = Doc_Store(doc_store_path)
+        stored_ids = doc_store.stored_ids(doc_id for doc_ids in topic_doc_ids for doc_id in doc_ids)
+        topic_doc_ids = [[doc_id for doc_id in doc_ids if doc_id not in stored_ids] for doc_ids in topic_doc_ids]
+
+    # Reads corpus files on background threads while earlier topics are tokenized and compressed
+    if prefetch_workers:
+        prefetcher = document_retriever.Doc_Prefetcher(topic_doc_ids, max_workers=prefetch_workers, lookahead=prefetch_lookahead, corpus_root=corpus_root, index_path=doc_index_path, cache_max_entries=cache_max_entries, cache_max_bytes=cache_max_bytes, streaming=streaming)
+
+    # Resolves every document of the topics file up front so each corpus file is read only once
+    elif batch_retrieval:
+        doc_ids = [doc_id for doc_ids in topic_doc_ids for doc_id in doc_ids]
+        raw_docs = doc_ret.retrieve_docs(doc_ids)
+        remaining_uses = Counter(doc_ids)
 
-        if topic_category:
-            topic_category = " ".join(topic_categories[topic_category])
+    try:
+        for topic_index, raw_topic in enumerate(raw_topics):
+            topic_id, title, narrative, docsetA_id, docsetA, topic_category = get_topic_attributes(raw_topic, title_tag, narrative_tag,topic_category_tag, docsetA_tag)
 
-        current_topic= Topic(topic_id = topic_id,docsetA_id = docsetA_id, title = title, narrative = narrative, category=topic_category) ########### Creates topic object
+            if topic_category:
+                topic_category = " ".join(topic_categories[topic_category])
 
-        populate_document_list(current_topic, docsetA, doc_ret)
+            if prefetcher:
+                raw_docs = prefetcher.get_topic_docs(topic_index)
+                remaining_uses = Counter(topic_doc_ids[topic_index])
 
-        current_topic.compute_tf_idf()
+            topic_attributes = (topic_id, docsetA_id, title, narrative, topic_category)
+            doc_attributes = list(extract_doc_attributes(docsetA, doc_ret, raw_docs, remaining_uses, doc_store))
 
-        topics.append(current_topic)
+            if doc_store:
+                doc_store.save()  #### Each topic's new documents are kept even if a later topic fails
 
-    return topics
+            yield topic_attributes, doc_attributes
+
+    finally:
+        if prefetcher:
+            prefetcher.shutdown()
+
+        if doc_store:
+            doc_store.close()
 
 ###############################
 
@@ -511,7 +1002,7 @@ Method used to create dummy data structures for testing purposes : Requires form
 '''''''''''''''''''''''''''''''''''''''''''''
 def build_pseudo_topic(pseudo_document_file_path, stemming:bool=False, lower:bool=False, idf_type:str=None, tf_type:str=None):
 
-    configure_class_objects(stemming,lower, idf_type, tf_type)
+    configure_class_objects(stemming,lower, idf_type, tf_type, False, False, False, False, False, False, False)
 
     #```doc_id = 1a \n date = 20110506 \n ### \n Sentence 1 would be here. \n Sentence 2 would be here, etc.```
     # (where ### is a metadata separator and everything below that would be a sentence on its own line)
@@ -554,5 +1045,13 @@ def build_pseudo_topic(pseudo_document_file_path, stemming:bool=False, lower:boo
 '''''''''''''''''''''''''''''''''''''''''''''
 Method used to create dummy data structures for the Gold Standard data
 '''''''''''''''''''''''''''''''''''''''''''''
+# Gold summaries are not ranked by select_content, so with compress_candidates their sentences are still compressed here,
+# the same as every sentence is compressed without it. This keeps the entity model independent of compress_candidates
 def get_gold_standard_docs(file_path:str)->list:
-    return [Document(parent_topic=Topic(),document_text=open(file_path+"/"+file_name).read()) for file_name in os.listdir(file_path)]
+    compress_candidates = Document.compress_candidates
+    Document.compress_candidates = 0
+
+    try:
+        return [Document(parent_topic=Topic(),document_text=open(file_path+"/"+file_name).read()) for file_name in os.listdir(file_path)]
+    finally:
+        Document.compress_candidates = compress_candidates
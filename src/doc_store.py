@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import sqlite3
+
+'''#####################################
+-Persistent SQLite store of extracted document attributes keyed by doc_id
+-Holds the (headline, category, dateline, text) tuple returned by data_input.get_doc_attributes
+-Lets repeat runs build Documents without reading or parsing the LDC corpora
+-New documents are committed every `commit_every` puts, so a run that is killed keeps most of what it extracted
+'''#######################################
+
+class Doc_Store:
+    def __init__(self, store_path:str, commit_every:int=100):
+        self.store_path = store_path
+        self.connection = sqlite3.connect(store_path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, headline TEXT, category TEXT, dateline TEXT, doc_text TEXT)")
+        self.commit_every = commit_every
+        self.uncommitted = 0  #### Puts since the last commit
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the stored (headline, category, dateline, doc_text) tuple of a document or None
+    def get(self, doc_id:str):
+        row = self.connection.execute("SELECT headline, category, dateline, doc_text FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    # Returns the set of doc ids that are already stored
+    def stored_ids(self, doc_ids)->set:
+        doc_ids = list(set(doc_ids))
+        stored = set()
+
+        #### SQLite limits the number of parameters in one query
+        for i in range(0, len(doc_ids), 500):
+            chunk = doc_ids[i:i + 500]
+            query = "SELECT doc_id FROM docs WHERE doc_id IN ({})".format(",".join("?" * len(chunk)))
+            stored.update(row[0] for row in self.connection.execute(query, chunk))
+
+        return stored
+
+    def put(self, doc_id:str, headline:str, category:str, dateline:str, doc_text:str):
+        self.connection.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?)", (doc_id, headline, category, dateline, doc_text))
+        self.uncommitted += 1
+
+        if self.uncommitted >= self.commit_every:
+            self.save()
+
+    # Commits any new documents to disk
+    def save(self):
+        if self.uncommitted:
+            self.connection.commit()
+            self.uncommitted = 0
+
+    def close(self):
+        self.save()
+        self.connection.close()
@@ -1,6 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import bisect
 import gzip
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 __author__ = "Benny Longwill"
 __email__ = "longwill@uw.edu"
@@ -13,12 +22,247 @@ from lxml.etree import XMLParser, parse
 -Class Object used to more easily retrieve raw document data from Acquaint and Acquaint2 Databases.
 -Configures document ID to create document file path and to determine database
 -Determines HTML or XML parsing and Tags used for internal element searching
--Caches XML/HTML files as they are parsed in Dictionary with path-file format 
+-Caches XML/HTML files as they are parsed in an LRU cache with path-file format, bounded by entry count and/or estimated bytes
+-Optionally streams corpus files DOC by DOC, parsing only the requested documents so memory stays flat regardless of file size.
+ The scan of each file resumes where the last request stopped and remembers where every DOC it passed is
+-Optionally keeps an on-disk index of doc_id -> (file path, byte offset, length) so a single DOC can be read without parsing the whole file
 '''#######################################
 
+#### Matches the opening DOC tag (but not DOCNO) and the doc id attribute used by Acquaint2 and Gigaword
+doc_start_re = re.compile(rb'^\s*<DOC[\s>]', re.IGNORECASE)
+doc_end_re = re.compile(rb'</DOC>', re.IGNORECASE)
+doc_id_attr_re = re.compile(rb'<DOC\s[^>]*id="([^"]+)"', re.IGNORECASE)
+#### Acquaint stores the doc id as text of a DOCNO element
+docno_re = re.compile(rb'<DOCNO>\s*(\S+)\s*</DOCNO>', re.IGNORECASE)
+
+#### Directory holding the LDC02T31 (Acquaint), LDC08T25 (Acquaint2) and LDC11T07 (Gigaword) corpora on patas
+default_corpus_root = '/corpora/LDC'
+
+#### In this one file there's a less than symbol that prevents parsing
+broken_gigaword_file = 'LDC11T07/data/xin_eng/xin_eng_200811.gz'
+
+#### Decompressed bytes between two access points of a gzip file. Each access point holds a copy of the zlib state (about 40KB)
+access_point_spacing = 1 << 20
+#### Compressed bytes read from a gzip file at a time
+gzip_chunk_size = 1 << 16
+#### Number of gzip files whose access points are kept by a Document_Retriever
+max_gzip_readers = 8
+#### Number of corpus files a streaming Document_Retriever keeps scanners open on
+max_stream_scanners = 8
+
+#### Serializes index saves of retrievers on different threads, e.g. the Doc_Prefetcher workers
+index_lock = threading.Lock()
+
+#### Memory of a parsed lxml tree relative to the uncompressed file size. Parsing each format of the synthetic corpus grew RSS by 2.8-3.0x
+tree_memory_factor = 3
+
+
+# Opens a corpus file as a binary stream. Gigaword files are gzipped so offsets refer to the decompressed stream
+def open_corpus_file(doc_path:str):
+    if doc_path.endswith(".gz"):
+        return gzip.open(doc_path, 'rb')
+    return open(doc_path, 'rb')
+
+
+# Streams a corpus file line by line and finds DOC boundaries without parsing any XML/HTML.
+# Yields (doc_id, byte offset, byte length, fragment) for every DOC in the file.
+# Only DOCs whose id is in keep_ids have their raw bytes returned as fragment, all other lines are dropped as they are read
+def iter_doc_fragments(doc_path:str, keep_ids=()):
+    with open_corpus_file(doc_path) as file:
+        position = 0
+        start = None
+        doc_id = None
+        lines = []
+
+        for line in file:
+            line_start = position
+            position += len(line)
+            first_char = 0
+
+            if start is None:
+                if not doc_start_re.match(line):
+                    continue
+                first_char = line.index(b'<')
+                start = line_start + first_char
+                id_match = doc_id_attr_re.search(line)
+                doc_id = id_match.group(1).decode('latin-1') if id_match else None
+
+            if doc_id is None:
+                docno_match = docno_re.search(line)
+                if docno_match:
+                    doc_id = docno_match.group(1).decode('latin-1')
+
+            end_match = doc_end_re.search(line)
+            last_char = end_match.end() if end_match else len(line)
+
+            #### The DOC id is not known until the DOCNO line for Acquaint, so lines are kept until it can be checked
+            if keep_ids and (doc_id is None or doc_id in keep_ids):
+                lines.append(line[first_char:last_char])
+
+            if end_match:
+                if doc_id:
+                    fragment = b''.join(lines) if doc_id in keep_ids else None
+                    yield doc_id, start, line_start + last_char - start, fragment
+                start = None
+                doc_id = None
+                lines = []
+
+
+# Scans a corpus file for DOC boundaries.
+# Returns a dictionary of doc_id -> (byte offset, byte length) of each DOC element
+def scan_doc_offsets(doc_path:str)->dict:
+    return {doc_id: (offset, length) for doc_id, offset, length, fragment in iter_doc_fragments(doc_path)}
+
+
+# Estimates the memory cost of a parsed corpus file from its uncompressed size.
+# Gzip stores the uncompressed size (mod 2^32) in the last 4 bytes so no decompression is needed
+def estimate_file_size(doc_path:str)->int:
+    if doc_path.endswith(".gz"):
+        with open(doc_path, 'rb') as file:
+            file.seek(-4, os.SEEK_END)
+            return struct.unpack('<I', file.read(4))[0]
+    return os.path.getsize(doc_path)
+
+
+# Estimates the memory held by the parsed tree of a corpus file, used as its cost in the Tree_Cache
+def estimate_tree_memory(doc_path:str)->int:
+    return estimate_file_size(doc_path) * tree_memory_factor
+
+
+'''#####################################
+-Random access to the decompressed bytes of a gzip file, in the way of zran.c from the zlib examples
+-One pass over the file keeps an access point about every `spacing` decompressed bytes: the compressed offset and a copy of the zlib decompressor there
+-A read restarts decompression at the last access point before the requested offset instead of at the start of the file
+-Access points are only kept in memory, so they are built the first time a retriever reads from the file
+'''#######################################
+class Gzip_Reader:
+    def __init__(self, doc_path:str, spacing:int=access_point_spacing):
+        self.file = open(doc_path, 'rb')
+        self.offsets = []  #### Decompressed offset of each access point, for bisect
+        self.points = []  #### (compressed offset, decompressor) of each access point
+
+        offset = 0
+        self.add_point(0, 0, zlib.decompressobj(zlib.MAX_WBITS | 16))
+        for data, decompressor in self.inflate(0, self.points[0][1].copy()):
+            offset += len(data)
+            if offset - self.offsets[-1] >= spacing:
+                self.add_point(offset, self.file.tell(), decompressor.copy())
+
+    def add_point(self, offset:int, compressed_offset:int, decompressor):
+        self.offsets.append(offset)
+        self.points.append((compressed_offset, decompressor))
+
+    # Decompresses the file from a compressed offset with the decompressor state at that offset.
+    # Yields each chunk's decompressed data and the decompressor state after the chunk.
+    # A gzip file can hold several members one after another, each one is read with a new decompressor
+    def inflate(self, compressed_offset:int, decompressor):
+        self.file.seek(compressed_offset)
+
+        for chunk in iter(lambda: self.file.read(gzip_chunk_size), b''):
+            data = []
+            while chunk:
+                data.append(decompressor.decompress(chunk))
+                chunk = b''
+                if decompressor.eof:
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+            yield b''.join(data), decompressor
+
+    # Returns `length` decompressed bytes starting at the decompressed byte `offset`
+    def read(self, offset:int, length:int)->bytes:
+        point = bisect.bisect_right(self.offsets, offset) - 1
+        compressed_offset, decompressor = self.points[point]
+        skip = offset - self.offsets[point]
+
+        data = []
+        needed = skip + length
+        for chunk, decompressor in self.inflate(compressed_offset, decompressor.copy()):
+            data.append(chunk)
+            needed -= len(chunk)
+            if needed <= 0:
+                break
+
+        return b''.join(data)[skip:skip + length]
+
+    def close(self):
+        self.file.close()
+
+
+'''#####################################
+-Least recently used cache for parsed corpus trees
+-Evicts the oldest trees once either max_entries or max_bytes is exceeded. None means no limit
+-Keeps hit, miss and eviction counters so cache behaviour can be reported after a run
+'''#######################################
+class Tree_Cache:
+    def __init__(self, max_entries:int=None, max_bytes:int=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  #### doc_path -> (tree, cost)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, doc_path):
+        return doc_path in self.entries
+
+    # Returns the cached tree (marking it most recently used) or None
+    def get(self, doc_path:str):
+        entry = self.entries.get(doc_path)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(doc_path)
+        return entry[0]
+
+    # Adds or refreshes a tree then evicts least recently used trees until back under budget
+    def put(self, doc_path:str, tree, cost:int=0):
+        if doc_path in self.entries:
+            self.total_bytes -= self.entries[doc_path][1]
+
+        self.entries[doc_path] = (tree, cost)
+        self.entries.move_to_end(doc_path)
+        self.total_bytes += cost
+
+        #### The newest tree is always kept, even if it alone is over budget
+        while len(self.entries) > 1 and self.over_budget():
+            self.remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def remove(self, doc_path:str):
+        tree, cost = self.entries.pop(doc_path)
+        self.total_bytes -= cost
+
+    def over_budget(self)->bool:
+        if self.max_entries is not None and len(self.entries) > self.max_entries:
+            return True
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            return True
+        return False
+
+    def stats(self)->dict:
+        return {"entries": len(self.entries), "bytes": self.total_bytes, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
 class Document_Retriever:
-    def __init__(self):
-        self.xml_parser_cache = {}
+    def __init__(self, index_path:str=None, cache_max_entries:int=None, cache_max_bytes:int=None, streaming:bool=False, corpus_root:str=default_corpus_root):
+        self.corpus_root = corpus_root.rstrip("/")
+        self.bytes_parsed = 0  #### Bytes of corpus data handed to the XML/HTML parsers, used for benchmarking
+        self.xml_parser_cache = Tree_Cache(max_entries=cache_max_entries, max_bytes=cache_max_bytes)
+        self.streaming = streaming  #### True extracts single documents from the byte stream instead of parsing and caching whole files
+        self.index_path = index_path  #### None disables the on-disk doc offset index
+        self.doc_index = {}  #### doc_id -> (doc_path, byte offset, byte length)
+        self.indexed_files = set()
+        self.gzip_readers = OrderedDict()  #### doc_path -> Gzip_Reader of the most recently read gzip files
+        self.stream_scanners = OrderedDict()  #### doc_path -> (iter_doc_fragments generator, ids it keeps) of the most recently streamed files
+        if index_path and os.path.exists(index_path):
+            self.load_index()
         self.date=None
         self.headline_tag = None
         self.category_tag = None
@@ -65,7 +309,7 @@ class Document_Retriever:
             self.dateline_tag = 'date_time'
             self.text_tag = 'text'
 
-            self.doc_path = "/corpora/LDC/LDC02T31/" + source.lower() + "/" + year + "/" + self.date + "_" + alt_source.upper()
+            self.doc_path = self.corpus_root + "/LDC02T31/" + source.lower() + "/" + year + "/" + self.date + "_" + alt_source.upper()
 
         elif self.acquaint2 or self.gigaword:
 
@@ -75,58 +319,300 @@ class Document_Retriever:
             self.category_tag = None
 
             if self.acquaint2:
-                self.doc_path = "/corpora/LDC/LDC08T25/data/" + alt_source.lower() + "_" + lang.lower() + "/" + alt_source.lower() + "_" + lang.lower() + "_" + self.date[:6] + ".xml"
+                self.doc_path = self.corpus_root + "/LDC08T25/data/" + alt_source.lower() + "_" + lang.lower() + "/" + alt_source.lower() + "_" + lang.lower() + "_" + self.date[:6] + ".xml"
             else:
-                self.doc_path = "/corpora/LDC/LDC11T07/data/" + alt_source.lower() + "_" + lang.lower() + "/" + alt_source.lower() + "_" + lang.lower() + "_" + self.date[:6] + ".gz"
+                self.doc_path = self.corpus_root + "/LDC11T07/data/" + alt_source.lower() + "_" + lang.lower() + "/" + alt_source.lower() + "_" + lang.lower() + "_" + self.date[:6] + ".gz"
+
+    # Reads the index of previously scanned corpus files from disk, adding it to the files this retriever has scanned
+    def load_index(self):
+        with open(self.index_path) as file:
+            data = json.load(file)
+
+        self.indexed_files.update(data["files"])
+        for doc_id, location in data["docs"].items():
+            self.doc_index.setdefault(doc_id, tuple(location))
+
+    # Writes the index to disk. Written to a temporary file first so an interrupted run can't corrupt it.
+    # Files another retriever saved to the same index since this one loaded it are kept
+    def save_index(self):
+        with index_lock:
+            if os.path.exists(self.index_path):
+                self.load_index()
+
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump({"files": sorted(self.indexed_files), "docs": self.doc_index}, file)
+            os.replace(tmp_path, self.index_path)
+
+    # Scans each corpus file once and records the location of every DOC it contains.
+    # The index is saved once after all new files have been scanned
+    def build_index(self, doc_paths):
+        new_paths = [doc_path for doc_path in dict.fromkeys(doc_paths) if doc_path not in self.indexed_files]
+
+        for doc_path in new_paths:
+            for doc_id, (offset, length) in scan_doc_offsets(doc_path).items():
+                self.doc_index[doc_id] = (doc_path, offset, length)
+            self.indexed_files.add(doc_path)
+
+        if self.index_path and new_paths:
+            self.save_index()
+
+    # Returns the Gzip_Reader of a gzip file, closing the least recently used reader once there are more than max_gzip_readers
+    def get_gzip_reader(self, doc_path:str)->Gzip_Reader:
+        if doc_path not in self.gzip_readers:
+            self.gzip_readers[doc_path] = Gzip_Reader(doc_path)
+            if len(self.gzip_readers) > max_gzip_readers:
+                self.gzip_readers.popitem(last=False)[1].close()
+
+        self.gzip_readers.move_to_end(doc_path)
+        return self.gzip_readers[doc_path]
+
+    # Seeks straight to an indexed document and parses only that fragment of the file.
+    # Gzip files can't seek without decompressing from the start, so they are read from their nearest access point
+    def read_indexed_doc(self, doc_id):
+        doc_path, offset, length = self.doc_index[doc_id]
+
+        if doc_path.endswith(".gz"):
+            fragment = self.get_gzip_reader(doc_path).read(offset, length)
+        else:
+            with open(doc_path, 'rb') as file:
+                file.seek(offset)
+                fragment = file.read(length)
 
-    #Method requires document ID to determine database and document file path.
-    # Retrieves raw document.
-    def retrieve_doc(self, doc_id):
-        self.configure(doc_id)
-        raw_doc = None
-        tree = self.xml_parser_cache.get(self.doc_path)
+        return self.parse_fragment(fragment, doc_path)
+
+    # Parses the bytes of a single DOC element with the parser matching the current database
+    def parse_fragment(self, fragment:bytes, doc_path:str):
+        self.bytes_parsed += len(fragment)
 
         if self.acquaint:
+            parser = etree.HTMLParser(encoding='utf-8', remove_blank_text=True)
+            body = html.fragment_fromstring(fragment.decode('utf-8', errors='replace'), create_parent='body', parser=parser)
+            return body.find("doc")
 
-            if tree is None:
-                parser = etree.HTMLParser(encoding='utf-8', remove_blank_text=True)
-                with open(self.doc_path) as file:
-                    tree = html.fragment_fromstring(file.read(), create_parent='body', parser=parser)
+        if self.gigaword:
+            data = fragment.decode('latin-1')
+            if doc_path.endswith(broken_gigaword_file):
+                data = data.replace('<3', 'lt 3')  ### Replaces the < with lt
+            return etree.fromstring(data, parser=XMLParser(huge_tree=True))
 
-            raw_doc = [element for element in tree.findall("doc") if element.find("docno").text == " " + doc_id + " "][0]
-            raw_doc.getparent().remove(raw_doc)  # Removes previous accessed raw document from tree to save memory in cache
+        return etree.fromstring(fragment)
 
-        elif self.acquaint2:
+    # Parses a whole corpus file with the parser matching the current database.
+    # Returns the tree and a dictionary of doc_id -> DOC element so documents can be found without searching the tree
+    def parse_file(self, doc_path:str):
+        self.bytes_parsed += estimate_file_size(doc_path)
 
-            if tree is None:
-                tree = etree.parse(self.doc_path)
+        if self.acquaint:
+            parser = etree.HTMLParser(encoding='utf-8', remove_blank_text=True)
+            with open(doc_path) as file:
+                tree = html.fragment_fromstring(file.read(), create_parent='body', parser=parser)
 
-            raw_doc = [element for element in tree.findall("DOC") if element.get("id") == doc_id][0]
-            #### Must not remove document from tree because documents repeat under different topics
+            doc_map = {element.find("docno").text.strip(): element for element in tree.findall("doc")}
 
-        elif self.gigaword:
+        elif self.acquaint2:
+            tree = etree.parse(doc_path)
 
-            if tree is None:
-                p = XMLParser(huge_tree=True) #### Some files are too large, without this they prevent parsing
+            doc_map = {element.get("id"): element for element in tree.findall("DOC")}
 
-                with gzip.open(self.doc_path, 'rt', encoding='latin-1') as file:
-                    data=file.read()
+        else:
+            p = XMLParser(huge_tree=True) #### Some files are too large, without this they prevent parsing
+
+            with gzip.open(doc_path, 'rt', encoding='latin-1') as file:
+                data=file.read()
+
+                if doc_path.endswith(broken_gigaword_file):
+                    data = data.replace('<3', 'lt 3') ### Replaces the < with lt
+
+                tree = etree.fromstring('<DOCSTREAM>\n' + data.strip() + '\n</DOCSTREAM>\n',parser=p)
+
+            doc_map = {element.get("id"): element for element in tree.findall("DOC")}
+
+        return tree, doc_map
+
+    # Streams a corpus file and yields (doc_id, raw document) for each requested doc id, in file order.
+    # Every other DOC is discarded unparsed and reading stops once all requested documents have been found
+    def stream_docs(self, doc_path:str, doc_ids):
+        remaining = set(doc_ids)
+
+        for doc_id, offset, length, fragment in iter_doc_fragments(doc_path, keep_ids=remaining):
+            if fragment is not None:
+                remaining.discard(doc_id)
+                yield doc_id, self.parse_fragment(fragment, doc_path)
+
+                if not remaining:
+                    break
+
+    # Streams one document from the current corpus file. The file's scanner is kept where it stopped, so the next
+    # document further on in the file continues the scan. Every DOC passed on the way has its location recorded in
+    # doc_index, so a document the scanner already passed is read by offset instead of scanning the file again
+    def stream_doc(self, doc_id):
+        if doc_id in self.doc_index:
+            return self.read_indexed_doc(doc_id)
+        if self.doc_path in self.indexed_files:
+            return None  #### The whole file was scanned without finding the document
+
+        if self.doc_path not in self.stream_scanners:
+            keep_ids = set()
+            self.stream_scanners[self.doc_path] = (iter_doc_fragments(self.doc_path, keep_ids=keep_ids), keep_ids)
+            if len(self.stream_scanners) > max_stream_scanners:
+                self.stream_scanners.popitem(last=False)[1][0].close()
+
+        self.stream_scanners.move_to_end(self.doc_path)
+        scanner, keep_ids = self.stream_scanners[self.doc_path]
+        keep_ids.add(doc_id)  #### The scanner reads keep_ids as it goes, so only this document's lines are kept
+
+        for found_id, offset, length, fragment in scanner:
+            self.doc_index[found_id] = (self.doc_path, offset, length)
+            if found_id == doc_id:
+                keep_ids.discard(doc_id)
+                return self.parse_fragment(fragment, self.doc_path)
+
+        #### The whole file has been scanned, any later request for it is read by offset
+        del self.stream_scanners[self.doc_path]
+        self.indexed_files.add(self.doc_path)
+        return None
+
+    # Resolves every doc id to its corpus file and groups the ids by file path, keeping first-seen order
+    def group_doc_ids(self, doc_ids)->dict:
+        doc_ids_by_path = {}
+        for doc_id in doc_ids:
+            self.configure(doc_id)
+            doc_ids_by_path.setdefault(self.doc_path, [])
+            if doc_id not in doc_ids_by_path[self.doc_path]:
+                doc_ids_by_path[self.doc_path].append(doc_id)
+        return doc_ids_by_path
+
+    # Batch version of retrieve_doc. Returns a dictionary of doc_id -> raw document.
+    # Each corpus file is opened and read once for all of its requested documents, and nothing of the file is kept
+    # after its last requested document has been extracted
+    def retrieve_docs(self, doc_ids)->dict:
+        raw_docs = {}
+        doc_ids_by_path = self.group_doc_ids(doc_ids)
+
+        #### New files are all scanned before the index is saved, so it is only written once
+        if self.index_path:
+            self.build_index(doc_ids_by_path)
+
+        for doc_path, path_doc_ids in doc_ids_by_path.items():
+            self.configure(path_doc_ids[0])  #### Sets the database flags used to parse this file's fragments
+
+            if self.index_path and all(doc_id in self.doc_index for doc_id in path_doc_ids):
+                #### Reads the documents in file order so the file is only passed through once
+                with open_corpus_file(doc_path) as file:
+                    for doc_id in sorted(path_doc_ids, key=lambda doc_id: self.doc_index[doc_id][1]):
+                        offset, length = self.doc_index[doc_id][1:]
+                        file.seek(offset)
+                        raw_docs[doc_id] = self.parse_fragment(file.read(length), doc_path)
+            else:
+                raw_docs.update(self.stream_docs(doc_path, path_doc_ids))
 
-                    #### In this one file there's a less than symbold that prevents parsing
-                    if self.doc_path =='/corpora/LDC/LDC11T07/data/xin_eng/xin_eng_200811.gz':
-                        data = data.replace('<3', 'lt 3') ### Replaces the < with lt
+        return raw_docs
+
+    #Method requires document ID to determine database and document file path.
+    # Retrieves raw document.
+    def retrieve_doc(self, doc_id):
+        self.configure(doc_id)
 
-                    tree = etree.fromstring('<DOCSTREAM>\n' + data.strip() + '\n</DOCSTREAM>\n',parser=p)
+        # When the index is enabled, files are scanned once and every later document is read by offset
+        if self.index_path:
+            if self.doc_path not in self.indexed_files:
+                self.build_index([self.doc_path])
+            if doc_id in self.doc_index:
+                return self.read_indexed_doc(doc_id)
 
+        if self.streaming:
+            return self.stream_doc(doc_id)
 
-            raw_doc = [element for element in tree.findall("DOC") if element.get("id") == doc_id][0]
-            raw_doc.getparent().remove(raw_doc)  # Removes previous accessed raw document from tree to save memory in cache
+        raw_doc = None
+        cached = self.xml_parser_cache.get(self.doc_path)
 
+        #### Each cache entry holds the parsed tree and a doc_id -> DOC element map built once when the file is parsed
+        if cached is None:
+            tree, doc_map = self.parse_file(self.doc_path)
+            self.xml_parser_cache.put(self.doc_path, (tree, doc_map), estimate_tree_memory(self.doc_path))
+        else:
+            tree, doc_map = cached
 
+        if self.acquaint2:
+            raw_doc = doc_map[doc_id]
+            #### Must not remove document from tree because documents repeat under different topics
 
-        self.xml_parser_cache.update({self.doc_path: tree})
+        else:
+            raw_doc = doc_map.pop(doc_id)
+            raw_doc.getparent().remove(raw_doc)  # Removes previous accessed raw document from tree to save memory in cache
 
         return raw_doc
 
 
 
+'''#####################################
+-Prefetches raw documents on a background thread pool while earlier topics are being processed
+-Takes the doc ids of every topic in the order the topics will be processed and groups them by corpus file
+-Each corpus file read gets the doc ids of a topic and of the topics up to `lookahead` after it that use the same file,
+ so nearby topics share one read of a file. A file used again by a later topic is read again then
+-Each worker thread keeps its own Document_Retriever with the same index, cache and streaming settings as the main retriever
+-Only files needed by the next `lookahead` topics are submitted, and each read is dropped once its topics have taken their
+ documents, so the documents held stay bounded by the lookahead instead of growing with the number of topics
+-The DOC boundary scan is a pure-Python loop that holds the GIL, so workers mostly overlap file reads and zlib
+ decompression with the main thread. With an index, only the requested fragments are read and parsed
+'''#######################################
+class Doc_Prefetcher:
+    def __init__(self, topic_doc_ids:list, max_workers:int=4, lookahead:int=2, corpus_root:str=default_corpus_root, index_path:str=None, cache_max_entries:int=None, cache_max_bytes:int=None, streaming:bool=False):
+        self.topic_doc_ids = topic_doc_ids
+        self.corpus_root = corpus_root
+        self.index_path = index_path
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_bytes = cache_max_bytes
+        self.streaming = streaming
+        self.lookahead = lookahead
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}  #### (topic_index, doc_path) -> Future of a doc_id -> raw document dictionary with the topic's documents of the file
+        self.local = threading.local()  #### Holds the Document_Retriever of each worker thread
+
+        doc_ret = Document_Retriever(corpus_root=corpus_root)
+        self.doc_ids_by_path = doc_ret.group_doc_ids(doc_id for doc_ids in topic_doc_ids for doc_id in doc_ids)  #### Every file any topic needs
+        self.paths_by_topic = [doc_ret.group_doc_ids(doc_ids) for doc_ids in topic_doc_ids]  #### doc_path -> doc ids, for each topic
+
+    # Returns the Document_Retriever of the current worker thread, created the first time the thread reads a file
+    def get_retriever(self)->Document_Retriever:
+        if not hasattr(self.local, "doc_ret"):
+            self.local.doc_ret = Document_Retriever(index_path=self.index_path, cache_max_entries=self.cache_max_entries, cache_max_bytes=self.cache_max_bytes, streaming=self.streaming, corpus_root=self.corpus_root)
+        return self.local.doc_ret
+
+    # Reads the given documents of one corpus file. Runs on a worker thread
+    def retrieve_file(self, doc_path:str, doc_ids:list)->dict:
+        return self.get_retriever().retrieve_docs(doc_ids)
+
+    # Submits a read of each file of a topic that is not already being read for it. The read also gets the documents
+    # of the topics up to lookahead after it that use the same file and are not already being read
+    def submit_topic(self, topic_index:int):
+        next_topics = range(topic_index, min(topic_index + self.lookahead + 1, len(self.topic_doc_ids)))
+
+        for doc_path in self.paths_by_topic[topic_index]:
+            if (topic_index, doc_path) in self.futures:
+                continue
+
+            sharing_topics = [index for index in next_topics if doc_path in self.paths_by_topic[index] and (index, doc_path) not in self.futures]
+            doc_ids = list(dict.fromkeys(doc_id for index in sharing_topics for doc_id in self.paths_by_topic[index][doc_path]))
+            future = self.executor.submit(self.retrieve_file, doc_path, doc_ids)
+
+            for index in sharing_topics:
+                self.futures[(index, doc_path)] = future
+
+    # Returns a doc_id -> raw document dictionary for one topic, waiting on any of its files still being read.
+    # Topics must be requested in order
+    def get_topic_docs(self, topic_index:int)->dict:
+        for next_index in range(topic_index, min(topic_index + self.lookahead + 1, len(self.topic_doc_ids))):
+            self.submit_topic(next_index)
+
+        raw_docs = {}
+        for doc_path, doc_ids in self.paths_by_topic[topic_index].items():
+            #### Dropped once taken, so a read is released when the last topic sharing it has its documents
+            path_docs = self.futures.pop((topic_index, doc_path)).result()
+            raw_docs.update((doc_id, path_docs[doc_id]) for doc_id in doc_ids if doc_id in path_docs)
+
+        return raw_docs
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -309,7 +309,7 @@ def build_entity_model(output_folder, num_permutations):
     build_svm_model(all_train_vectors, output_folder)
 
 
-def order_info_entity(topics_with_summaries, num_permutations, output_folder):
+def order_info_entity(topics_with_summaries, num_permutations, output_folder, build_model=True):
     """
     Entity-based ordering approach
     This function takes in a list of Topic objects with ranked summaries
@@ -320,10 +320,14 @@ def order_info_entity(topics_with_summaries, num_permutations, output_folder):
 
     It returns a list of Topics with the most optimal order based
     on the ranking of the model
+
+    build_model can be False when the model in output_folder was already
+    built by an earlier call, e.g. when topics are ordered in batches
     """
 
     # Build the entity model using SVM rank
-    build_entity_model(output_folder, num_permutations)
+    if build_model:
+        build_entity_model(output_folder, num_permutations)
 
     # Get test vectors for model
     all_test_vectors, test_vectors_sentence_indices, topic_objects_of_test_vectors = get_testing_vectors(topics_with_summaries, num_permutations)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import hashlib
+import os
+import pickle
+import uuid
+from content_realization import parse_sentences
+
+'''#####################################
+-On-disk cache of spaCy parses of clean sentences, keyed by a hash of the sentence text and kept in one directory per spaCy model name and version
+-Parses are stored as the words, spaces and Doc.to_array() of the parse attributes of each Doc, which spaCy 2.1 has as well as later versions.
+ All stored files are read when the cache is opened and new parses are written together by save()
+-Each save() writes a new file, so saves never rewrite parses stored by earlier runs
+-A repeat run over the same sentences with the same model does not parse or even load the model
+'''#######################################
+
+#### Token attributes content_realization needs from a parse, besides the words and spaces each Doc is made from
+parse_attrs = ["TAG", "POS", "LEMMA", "HEAD", "DEP"]
+
+#### Extension of the files parses are stored in
+parse_file_extension = ".parses"
+
+
+# Returns the spaCy attribute ids of parse_attrs. spaCy 2.1's Doc.from_array only takes ids, not names
+def get_parse_attr_ids()->list:
+    from spacy.attrs import IDS
+
+    return [IDS[attr] for attr in parse_attrs]
+
+
+class Parse_Cache:
+    def __init__(self, cache_root:str, model_name:str):
+        self.cache_root = cache_root
+        self.cache_dir = os.path.join(cache_root, model_name)
+        self.docs = {}  ##### sentence key -> parsed Doc
+        self.new_docs = []  ##### Parses not yet saved
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load()
+
+    def __len__(self):
+        return len(self.docs)
+
+    # Returns the cache key of a sentence
+    @classmethod
+    def make_key(cls, sentence:str)->str:
+        return hashlib.sha256(sentence.encode()).hexdigest()
+
+    # Reads every stored parse file. The words and spaces give the exact text of each Doc, so each key is recomputed from it
+    def load(self):
+        from spacy.tokens import Doc
+        from spacy.vocab import Vocab
+
+        vocab = Vocab()  #### Docs can be loaded without the model, which is only loaded to parse misses
+        attr_ids = get_parse_attr_ids()
+
+        for file_name in sorted(os.listdir(self.cache_dir)):
+            if file_name.endswith(parse_file_extension):
+                with open(os.path.join(self.cache_dir, file_name), 'rb') as file:
+                    strings, parses = pickle.load(file)
+
+                #### The array holds the hashes of the tags, lemmas and labels, which the vocab needs the strings of
+                for string in strings:
+                    vocab.strings.add(string)
+
+                for words, spaces, array in parses:
+                    doc = Doc(vocab, words=words, spaces=spaces)
+                    doc.from_array(attr_ids, array)
+                    self.docs[Parse_Cache.make_key(doc.text)] = doc
+
+    # Returns the cached parse of a sentence or None
+    def get(self, sentence:str):
+        doc = self.docs.get(Parse_Cache.make_key(sentence))
+        if doc is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return doc
+
+    def put(self, sentence:str, doc):
+        key = Parse_Cache.make_key(sentence)
+        if key not in self.docs:
+            self.docs[key] = doc
+            self.new_docs.append(doc)
+
+    # Returns the parses of a list of sentences like content_realization.parse_sentences, parsing only the sentences
+    # that are not cached. get_model is called to get the spaCy model only if a sentence has to be parsed
+    def pipe(self, sentences:list, get_model, batch_size:int=1000, n_process:int=1)->list:
+        docs = [self.get(sentence) for sentence in sentences]
+
+        #### Each sentence that is not cached is parsed once, even if it is repeated
+        missing = list(dict.fromkeys(sentence for sentence, doc in zip(sentences, docs) if doc is None))
+
+        if missing:
+            for sentence, doc in zip(missing, parse_sentences(missing, get_model(), batch_size, n_process)):
+                self.put(sentence, doc)
+
+            docs = [self.docs[Parse_Cache.make_key(sentence)] if doc is None else doc for sentence, doc in zip(sentences, docs)]
+
+        return docs
+
+    # Writes the parses added since the last save to a new parse file.
+    # Written to a temporary file first so an interrupted run can't leave a partial cache file
+    def save(self):
+        if not self.new_docs:
+            return
+
+        attr_ids = get_parse_attr_ids()
+        strings = set()
+        parses = []
+
+        for doc in self.new_docs:
+            strings.update(string for token in doc for string in (token.tag_, token.lemma_, token.dep_))
+            parses.append(([token.text for token in doc], [bool(token.whitespace_) for token in doc], doc.to_array(attr_ids)))
+
+        path = os.path.join(self.cache_dir, uuid.uuid4().hex + parse_file_extension)
+        tmp_path = path + ".tmp"
+
+        with open(tmp_path, 'wb') as file:
+            pickle.dump((sorted(strings), parses), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        self.new_docs = []
+
+    def hit_rate(self)->float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self)->dict:
+        return {"entries": len(self.docs), "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate()}
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import json
+import os
+from nltk import PorterStemmer
+
+'''#####################################
+-Memo table of Porter stems shared by every Sentence in the process
+-News text repeats a small vocabulary, so most tokens are looked up instead of stemmed again
+-Can be loaded from and saved to a JSON file so the table carries over between runs
+'''#######################################
+
+class Stem_Table:
+    ps = PorterStemmer()
+
+    def __init__(self, table_path:str=None):
+        self.table_path = table_path
+        self.stems = {}  ##### token -> Porter stem
+        self.hits = 0
+        self.misses = 0
+        self.new_stems = None  ##### Stems added since the last pop_new_stems(), only kept after track_new_stems()
+
+        if table_path and os.path.exists(table_path):
+            with open(table_path) as file:
+                self.stems = json.load(file)
+
+    def __len__(self):
+        return len(self.stems)
+
+    # Returns the Porter stem of a token, which is also lowercased by the stemmer
+    def stem(self, token:str)->str:
+        stem = self.stems.get(token)
+        if stem is None:
+            self.misses += 1
+            stem = Stem_Table.ps.stem(token)
+            self.stems[token] = stem
+            if self.new_stems is not None:
+                self.new_stems[token] = stem
+        else:
+            self.hits += 1
+        return stem
+
+    # Starts keeping the stems added from now on, e.g. in a worker process whose stems are saved by its parent
+    def track_new_stems(self):
+        self.new_stems = {}
+
+    # Returns the stems added since track_new_stems() or the last call, and starts keeping a new set
+    def pop_new_stems(self)->dict:
+        new_stems, self.new_stems = self.new_stems, {}
+        return new_stems
+
+    # Adds stems made by another table, e.g. one returned by pop_new_stems() in a worker process
+    def update(self, stems:dict):
+        self.stems.update(stems)
+
+    # Writes the table to disk. Written to a temporary file first so an interrupted run can't corrupt it
+    def save(self):
+        if self.table_path:
+            tmp_path = self.table_path + ".tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(self.stems, file)
+            os.replace(tmp_path, self.table_path)
+
+    def hit_rate(self)->float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self)->dict:
+        return {"entries": len(self.stems), "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate()}
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Writes a synthetic LDC corpus (Acquaint, Acquaint2 and Gigaword files) and a matching TAC topics file
+so document retrieval can be run and benchmarked off patas."""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import argparse
+import gzip
+import os
+import random
+
+#### Small vocabulary so that generated sentences repeat words the way news text does
+vocabulary = ("the a of to in and said on for with by was at from that his her their officials police government "
+              "president minister city state country people year week day report reported according told killed "
+              "attack storm flood earthquake election vote court trial company market price oil school students "
+              "hospital water fire army troops leaders talks agreement investigation victims rescue workers "
+              "percent million billion dollars new first last two three after before during since while").split()
+
+source = "APW"
+
+
+def make_sentence(rng:random.Random)->str:
+    words = [rng.choice(vocabulary) for _ in range(rng.randint(8, 30))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_paragraphs(rng:random.Random, sentences_per_doc:int)->list:
+    sentences = [make_sentence(rng) for _ in range(sentences_per_doc)]
+    return [" ".join(sentences[i:i + 3]) for i in range(0, len(sentences), 3)]
+
+
+# Acquaint files have no root element, upper case tags and the doc id as the text of DOCNO
+def acquaint_doc(rng:random.Random, doc_id:str, sentences_per_doc:int)->str:
+    paragraphs = "".join("<P>\n{}\n</P>\n".format(paragraph) for paragraph in make_paragraphs(rng, sentences_per_doc))
+    return ("<DOC>\n<DOCNO> {} </DOCNO>\n<DOCTYPE> NEWS STORY </DOCTYPE>\n<DATE_TIME> {}-{}-{} 00:00 </DATE_TIME>\n<BODY>\n"
+            "<CATEGORY> usa </CATEGORY>\n<HEADLINE>\n{}\n</HEADLINE>\n<TEXT>\n{}</TEXT>\n</BODY>\n</DOC>\n").format(
+        doc_id, doc_id[3:7], doc_id[7:9], doc_id[9:11], make_sentence(rng), paragraphs)
+
+
+# Acquaint2 and Gigaword DOCs carry the doc id as an attribute
+def xml_doc(rng:random.Random, doc_id:str, sentences_per_doc:int)->str:
+    paragraphs = "".join("<P>\n{}\n</P>\n".format(paragraph) for paragraph in make_paragraphs(rng, sentences_per_doc))
+    return ("<DOC id=\"{}\" type=\"story\" >\n<HEADLINE>\n{}\n</HEADLINE>\n<DATELINE>\nCITY, {}\n</DATELINE>\n"
+            "<TEXT>\n{}</TEXT>\n</DOC>\n").format(doc_id, make_sentence(rng), doc_id[8:16], paragraphs)
+
+
+# Writes one corpus file per (year, month) of each database and returns the doc ids written to each file
+def write_corpus(corpus_root:str, num_files:int, docs_per_file:dict, sentences_per_doc:int, rng:random.Random)->dict:
+    doc_ids_by_file = {}
+
+    for file_index in range(num_files):
+        month = "{:02d}".format(file_index % 12 + 1)
+
+        # Acquaint: one file per day and source
+        date = "1998" + month + "01"
+        doc_ids = [source + date + ".{:04d}".format(i + 1) for i in range(docs_per_file["acquaint"])]
+        path = os.path.join(corpus_root, "LDC02T31", source.lower(), date[:4], date + "_" + source + "_ENG")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.writelines(acquaint_doc(rng, doc_id, sentences_per_doc) for doc_id in doc_ids)
+        doc_ids_by_file[path] = doc_ids
+
+        # Acquaint2: one XML file per month and source, wrapped in a DOCSTREAM root element
+        date = "2005" + month + "01"
+        doc_ids = [source + "_ENG_" + date + ".{:04d}".format(i + 1) for i in range(docs_per_file["acquaint2"])]
+        path = os.path.join(corpus_root, "LDC08T25", "data", source.lower() + "_eng", source.lower() + "_eng_" + date[:6] + ".xml")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write("<DOCSTREAM>\n")
+            file.writelines(xml_doc(rng, doc_id, sentences_per_doc) for doc_id in doc_ids)
+            file.write("</DOCSTREAM>\n")
+        doc_ids_by_file[path] = doc_ids
+
+        # Gigaword: one gzipped latin-1 file per month and source with no root element
+        date = "2007" + month + "01"
+        doc_ids = [source + "_ENG_" + date + ".{:04d}".format(i + 1) for i in range(docs_per_file["gigaword"])]
+        path = os.path.join(corpus_root, "LDC11T07", "data", source.lower() + "_eng", source.lower() + "_eng_" + date[:6] + ".gz")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, 'wt', encoding='latin-1') as file:
+            file.writelines(xml_doc(rng, doc_id, sentences_per_doc) for doc_id in doc_ids)
+        doc_ids_by_file[path] = doc_ids
+
+    return doc_ids_by_file
+
+
+# Writes a TAC style topics file where each topic draws its documents from every corpus file.
+# Documents are not repeated across topics since Acquaint and Gigaword documents are removed from the cache once retrieved
+def write_topics_file(topics_path:str, doc_ids_by_file:dict, num_topics:int, docs_per_topic:int, rng:random.Random):
+    all_files = list(doc_ids_by_file)
+    unused_doc_ids = {path: rng.sample(doc_ids, len(doc_ids)) for path, doc_ids in doc_ids_by_file.items()}
+
+    with open(topics_path, 'w') as file:
+        file.write("<TACtaskdata>\n")
+
+        for topic_index in range(num_topics):
+            topic_id = "D{:04d}A".format(1001 + topic_index)
+            doc_ids = [unused_doc_ids[all_files[i % len(all_files)]].pop() for i in range(docs_per_topic)]
+
+            file.write("<topic id = \"{}\">\n<title> {} </title>\n<docsetA id = \"{}-A\">\n".format(topic_id, make_sentence(rng), topic_id))
+            file.writelines("<doc id = \"{}\" />\n".format(doc_id) for doc_id in doc_ids)
+            file.write("</docsetA>\n</topic>\n")
+
+        file.write("</TACtaskdata>\n")
+
+
+def generate(corpus_root:str, topics_path:str, num_files:int=2, num_topics:int=10, docs_per_topic:int=10, sentences_per_doc:int=15, acquaint_docs:int=400, acquaint2_docs:int=5000, gigaword_docs:int=10000, seed:int=573):
+    """
+    Writes a synthetic corpus under corpus_root laid out like /corpora/LDC and a topics file that references it
+
+    Args:
+        corpus_root: directory to write the LDC02T31, LDC08T25 and LDC11T07 directories to
+        topics_path: path of the topics XML file to write
+        num_files: number of files written for each of the three databases
+        num_topics: number of topics in the topics file
+        docs_per_topic: number of documents in each topic docset
+        sentences_per_doc: number of sentences in each document
+        acquaint_docs: documents per Acquaint (daily) file
+        acquaint2_docs: documents per Acquaint2 (monthly) file
+        gigaword_docs: documents per Gigaword (monthly) file
+        seed: random seed so runs are repeatable
+
+    """
+    rng = random.Random(seed)
+    docs_per_file = {"acquaint": acquaint_docs, "acquaint2": acquaint2_docs, "gigaword": gigaword_docs}
+
+    doc_ids_by_file = write_corpus(corpus_root, num_files, docs_per_file, sentences_per_doc, rng)
+
+    if os.path.dirname(topics_path):
+        os.makedirs(os.path.dirname(topics_path), exist_ok=True)
+    write_topics_file(topics_path, doc_ids_by_file, num_topics, docs_per_topic, rng)
+
+
+if __name__ == '__main__':
+
+    p = argparse.ArgumentParser()
+    p.add_argument('corpus_root')
+    p.add_argument('topics_path')
+    p.add_argument('--num_files', type=int, default=2)
+    p.add_argument('--num_topics', type=int, default=10)
+    p.add_argument('--docs_per_topic', type=int, default=10)
+    p.add_argument('--sentences_per_doc', type=int, default=15)
+    p.add_argument('--acquaint_docs', type=int, default=400)
+    p.add_argument('--acquaint2_docs', type=int, default=5000)
+    p.add_argument('--gigaword_docs', type=int, default=10000)
+    p.add_argument('--seed', type=int, default=573)
+    args = p.parse_args()
+
+    generate(args.corpus_root, args.topics_path, args.num_files, args.num_topics, args.docs_per_topic, args.sentences_per_doc, args.acquaint_docs, args.acquaint2_docs, args.gigaword_docs, args.seed)
@@ -7,9 +7,9 @@ __author__ = 'Shannon Ladymon, Haley Lepp, Ben Longwill, Amina Venton'
 __email__ = \
     'sladymon@uw.edu, hlepp@uw.edu, longwill@uw.edu, aventon@uw.edu'
 
-from data_input import get_data, get_gold_standard_docs
+from data_input import get_data, iter_data, get_gold_standard_docs, get_parse_cache_stats
 from content_selection import select_content
-from info_ordering import order_info_chron, order_info_entity, get_training_vectors
+from info_ordering import order_info_chron, order_info_entity, build_entity_model, get_training_vectors
 from evaluation import eval_summary
 from sys import argv
 import argparse
@@ -126,7 +126,58 @@ def summarize_topics_list(topics, output_folder, test_type, d, intersent_thresho
 
 
 
-def summarize_text(file_path, output_folder, test_type, stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl):
+def summarize_topics_stream(topics, output_folder, test_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, batch_size=1):
+    """
+    Same as summarize_topics_list, but takes any iterable of Topics (e.g. the generator from iter_data)
+    and runs selection, ordering and writing on batch_size topics at a time. Only the current batch
+    is kept, and each summary file is written as soon as its batch is done. ROUGE runs once at the end.
+
+    Args:
+        topics: an iterable of Topic objects (which include Documents and Sentences)
+        batch_size: number of topics selected, ordered and written together
+        all other args are those of summarize_topics_list
+
+    """
+
+    # The entity model is trained once and reused for every batch. It is only built after the first topic is pulled,
+    # since iter_data sets the preprocessing settings the gold standard documents are read with when it starts
+    model_built = info_order_type != "entity"
+
+    batch = []
+    for topic in topics:
+        batch.append(topic)
+
+        if not model_built:
+            build_entity_model(output_folder, num_permutations)
+            model_built = True
+
+        if len(batch) == batch_size:
+            summarize_topics_batch(batch, output_folder, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations)
+            batch = []
+
+    if batch:
+        summarize_topics_batch(batch, output_folder, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations)
+
+    # Evaluates summaries for each topic
+    # by running ROUGE-1 & ROUGE-2
+
+    eval_summary(output_folder, test_type)
+
+
+def summarize_topics_batch(topics, output_folder, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations):
+    "Selects, orders and writes the summaries of one batch of topics for summarize_topics_stream"
+
+    topics_with_summaries = select_content(topics, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula)
+
+    if info_order_type == "entity":
+        topics_with_summaries_in_order = order_info_entity(topics_with_summaries, num_permutations, output_folder, build_model=False)
+    else:
+        topics_with_summaries_in_order = order_info_chron(topics_with_summaries)
+
+    write_summary_files(topics_with_summaries_in_order, output_folder)
+
+
+def summarize_text(file_path, output_folder, test_type, stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, stream_batch_size=0, compress_candidates=0, parse_cache_dir=None, prefilter_compression=False, prefetch_workers=0):
     """
     Creates extractive summaries (<= 100 words) of multi-document news sets from TAC 2009/2010
     Prints one summary file per topic and nests inside outputs/<output_folder>/
@@ -159,6 +210,16 @@ def summarize_text(file_path, output_folder, test_type, stemming, lower, idf_typ
         remove_advcl:bool True if adverbial clause modifier should be removed in sentence compression
         remove_relcl:bool True if relative clause modifier should be removed in sentence compression
         remove_acl: True if a finite or non-finite clausal modifier should be removed in in sentence compression
+        stream_batch_size: 0 builds every topic before summarizing. Otherwise topics are built, summarized and written
+            this many at a time, so only the current batch is held in memory
+        compress_candidates: 0 compresses every sentence while reading the data. Otherwise only this many top ranked
+            sentences of each topic are parsed and compressed during content selection, see data_input.get_data
+        parse_cache_dir: optional directory of spaCy parses kept between runs, so a repeat run does not parse
+            sentences again. Its hit and miss counts are printed at the end
+        prefilter_compression: True skips parsing sentences with no cue for an enabled remove_appos, remove_advcl,
+            remove_relcl or remove_acl rule, see content_realization.could_trim
+        prefetch_workers: number of background threads reading corpus files ahead of the topic being built, 0 disables
+            prefetching. With stream_batch_size and no prefetching, each topic's documents are retrieved when it is built
 
     Returns:
         topic_list: the modified topic_list from the input, with a list of selected sentences
@@ -169,10 +230,26 @@ def summarize_text(file_path, output_folder, test_type, stemming, lower, idf_typ
     # Read in input data
     # and handle content realization as a pre-processing step
     # and return a list of Topic objects (with Documents/Sentences)
-    topics = get_data(file_path, stemming, lower, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl)
+    if stream_batch_size:
+        #### Documents are retrieved per topic instead of all up front, so the first topic is yielded without waiting on the whole corpus
+        topics = iter_data(file_path, stemming, lower, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, batch_retrieval=False, prefetch_workers=prefetch_workers, compress_candidates=compress_candidates, parse_cache_dir=parse_cache_dir, prefilter_compression=prefilter_compression)
+
+        summarize_topics_stream(topics, output_folder, test_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, stream_batch_size)
+        print_parse_cache_stats(parse_cache_dir)
+        return
+
+    topics = get_data(file_path, stemming, lower, idf_type, tf_type, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, prefetch_workers=prefetch_workers, compress_candidates=compress_candidates, parse_cache_dir=parse_cache_dir, prefilter_compression=prefilter_compression)
 #    topics = get_data(file_path, stemming, lower, idf_type, tf_type)
 
     summarize_topics_list(topics, output_folder, test_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations)
+    print_parse_cache_stats(parse_cache_dir)
+
+
+def print_parse_cache_stats(parse_cache_dir):
+    "Prints the spaCy parse cache hits and misses of this process when a parse cache was used"
+
+    if parse_cache_dir:
+        print("spaCy parse cache {}: {}".format(parse_cache_dir, get_parse_cache_stats()))
 
 
 if __name__ == '__main__':
@@ -206,6 +283,11 @@ if __name__ == '__main__':
     p.add_argument('remove_advcl')
     p.add_argument('remove_relcl')
     p.add_argument('remove_acl')
+    p.add_argument('--stream_batch_size', type=int, default=0, help="summarize and write topics this many at a time as they are built, 0 builds all topics first")
+    p.add_argument('--compress_candidates', type=int, default=0, help="parse and compress only this many top ranked sentences of each topic, 0 compresses every sentence")
+    p.add_argument('--prefilter_compression', action='store_true', help="skip parsing sentences with no cue for an enabled remove_appos, remove_advcl, remove_relcl or remove_acl rule")
+    p.add_argument('--parse_cache_dir', default=None, help="directory of spaCy parses kept between runs")
+    p.add_argument('--prefetch_workers', type=int, default=0, help="threads reading corpus files ahead of the topic being built, 0 disables prefetching")
     args = p.parse_args()
  
     dev_path = str(args.dev_file)
@@ -235,6 +317,11 @@ if __name__ == '__main__':
     remove_advcl = bool(int(args.remove_advcl))
     remove_relcl = bool(int(args.remove_relcl))
     remove_acl = bool(int(args.remove_acl))
+    stream_batch_size = args.stream_batch_size
+    compress_candidates = args.compress_candidates
+    parse_cache_dir = args.parse_cache_dir
+    prefilter_compression = args.prefilter_compression
+    prefetch_workers = args.prefetch_workers
 
     dev_output_folder = output_folder + "_devtest"
     eval_output_folder = output_folder + "_evaltest"
@@ -243,17 +330,17 @@ if __name__ == '__main__':
     if test_type == "dev":
 
         # Run the text summarizer on dev data with the given parameters
-        summarize_text(dev_path, dev_output_folder, test_type, stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl)	
+        summarize_text(dev_path, dev_output_folder, test_type, stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, stream_batch_size, compress_candidates, parse_cache_dir, prefilter_compression, prefetch_workers)	
 
     elif test_type == "eval":
 
         # Run the text summarizer on eval data with the given parameters
-        summarize_text(eval_path, eval_output_folder, test_type, stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl)	
+        summarize_text(eval_path, eval_output_folder, test_type, stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, stream_batch_size, compress_candidates, parse_cache_dir, prefilter_compression, prefetch_workers)	
 
     else:
 
         # Run the text summarizer on dev data with the given parameters
-        summarize_text(dev_path, dev_output_folder, "dev", stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl)	
+        summarize_text(dev_path, dev_output_folder, "dev", stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, stream_batch_size, compress_candidates, parse_cache_dir, prefilter_compression, prefetch_workers)	
 
         # Run the text summarizer on eval data with the given parameters
-        summarize_text(eval_path, eval_output_folder, "eval", stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl)	
+        summarize_text(eval_path, eval_output_folder, "eval", stemming, lower, idf_type, tf_type, d, intersent_threshold, summary_threshold, epsilon, mle_lambda, k, min_sent_len, include_narrative, bias_formula, intersent_formula, info_order_type, num_permutations, remove_header, remove_parens, remove_quotes, remove_appos, remove_advcl, remove_relcl, remove_acl, stream_batch_size, compress_candidates, parse_cache_dir, prefilter_compression, prefetch_workers)	
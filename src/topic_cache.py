@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import hashlib
+import os
+import pickle
+
+'''#####################################
+-Content addressed on-disk cache of fully built Topic lists
+-Keyed by a hash of the topics file (and categories file) contents and the preprocessing settings,
+ so a repeat run with identical input and preprocessing loads its topics instead of rebuilding them
+-Topics are stored with pickle's highest protocol, which loads far faster than rebuilding
+'''#######################################
+
+#### Changed whenever Topic, Document or Sentence change shape or tokens so that old cache files are not loaded
+cache_format_version = 5
+
+
+class Topic_Cache:
+    def __init__(self, cache_dir:str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Returns the cache key of a topics file built with the given preprocessing settings.
+    # input_paths are hashed by content, so moving or touching a file keeps its key
+    @classmethod
+    def make_key(cls, input_paths:list, settings:tuple)->str:
+        key_hash = hashlib.sha256(repr((cache_format_version, settings)).encode())
+
+        for path in input_paths:
+            if path and os.path.exists(path):
+                with open(path, 'rb') as file:
+                    key_hash.update(hashlib.sha256(file.read()).digest())
+            else:
+                key_hash.update(b"missing")
+
+        return key_hash.hexdigest()
+
+    def cache_path(self, key:str)->str:
+        return os.path.join(self.cache_dir, key + ".pickle")
+
+    # Returns the cached list of topics or None
+    def get(self, key:str):
+        path = self.cache_path(key)
+
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        with open(path, 'rb') as file:
+            topics = pickle.load(file)
+
+        self.hits += 1
+        return topics
+
+    # Writes to a temporary file first so an interrupted run can't leave a partial cache file
+    def put(self, key:str, topics:list):
+        path = self.cache_path(key)
+        tmp_path = path + ".tmp"
+
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(topics, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
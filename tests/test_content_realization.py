@@ -3,16 +3,201 @@
 import unittest
 import sys
 sys.path.append("../src")
-from content_realization import realize_content
+from spacy.vocab import Vocab
+from spacy.tokens import Doc
+from content_realization import find_subtree_indices, find_dependency_indices, trim_sentence, get_trimmed_sentences, get_annotated_variants, clean_sentence, could_trim, get_compressed_sentences, get_compressed_sentences_batch, get_annotated_sentences, get_annotated_sentences_batch
+
+#### Stands in for the spaCy model, returning the hand-built parse of each sentence
+class Doc_Parser:
+
+	def __init__(self, docs):
+		self.docs = {doc.text: doc for doc in docs}
+
+	def __call__(self, sentence):
+		return self.docs[sentence]
+
+	def pipe(self, sentences, batch_size=1000):
+		return map(self, sentences)
 
 class TestContentRealization(unittest.TestCase):
 
-    def test_realize_content(self):
+	def setUp(self):
+		self.vocab = Vocab()
+
+		# "Obama, the president, spoke to reporters who waited." with the appositive "the president" and relative clause "who waited"
+		self.appos_doc = Doc(self.vocab, words=["Obama", ",", "the", "president", ",", "spoke", "to", "reporters", "who", "waited", "."],
+							 spaces=[False, True, True, False, True, True, True, True, True, False, False],
+							 heads=[5, 0, 3, 0, 0, 5, 5, 6, 9, 7, 5],
+							 deps=["nsubj", "punct", "det", "appos", "punct", "ROOT", "prep", "pobj", "nsubj", "relcl", "punct"])
+
+		# "the man, the farmer, left." where the appositive repeats the word "the"
+		self.duplicate_doc = Doc(self.vocab, words=["the", "man", ",", "the", "farmer", ",", "left", "."],
+								 spaces=[True, False, True, True, False, True, False, False],
+								 heads=[1, 6, 1, 4, 1, 1, 6, 6],
+								 deps=["det", "nsubj", "punct", "det", "appos", "punct", "ROOT", "punct"])
+
+
+	def test_find_subtree_indices(self):
+
+		# Test that subtree indices are the token positions, even for a word that occurs earlier in the sentence
+		self.assertEqual(find_subtree_indices(self.appos_doc, "appos"), [2, 3])
+		self.assertEqual(find_subtree_indices(self.duplicate_doc, "appos"), [3, 4])
+		self.assertEqual(find_subtree_indices(self.duplicate_doc, "relcl"), [])
+
+
+	def test_find_dependency_indices(self):
+
+		# "He left because she cried when it rained." with an adverbial clause nested in another
+		advcl_doc = Doc(self.vocab, words=["He", "left", "because", "she", "cried", "when", "it", "rained", "."],
+						spaces=[True, True, True, True, True, True, True, False, False],
+						heads=[1, 1, 4, 4, 1, 7, 7, 4, 1],
+						deps=["nsubj", "ROOT", "mark", "nsubj", "advcl", "advmod", "nsubj", "advcl", "punct"])
+
+		# "I met the man who owns the dog that bit me." with a relative clause nested in another
+		relcl_doc = Doc(self.vocab, words=["I", "met", "the", "man", "who", "owns", "the", "dog", "that", "bit", "me", "."],
+						spaces=[True, True, True, True, True, True, True, True, True, True, False, False],
+						heads=[1, 1, 3, 1, 5, 3, 7, 5, 9, 7, 9, 1],
+						deps=["nsubj", "ROOT", "det", "dobj", "nsubj", "relcl", "det", "dobj", "nsubj", "relcl", "dobj", "punct"])
+
+		dependency_types = ["appos", "advcl", "relcl", "acl"]
+
+		# Test that the single pass collects, for each dependency type, the subtree indices a separate pass per type collects
+		for doc in [self.appos_doc, self.duplicate_doc, advcl_doc, relcl_doc]:
+			indices_by_dependency = find_dependency_indices(doc, dependency_types)
+			for dependency_type in dependency_types:
+				per_type_indices = {subtree_token.i for token in doc if token.dep_ == dependency_type for subtree_token in token.subtree}
+				self.assertEqual(indices_by_dependency[dependency_type], per_type_indices, (doc.text, dependency_type))
+
+		# Test that a nested clause is removed along with the clause it is part of
+		self.assertEqual(trim_sentence(advcl_doc, "advcl"), "He left.")
+		self.assertEqual(trim_sentence(relcl_doc, "relcl"), "I met the man.")
+		self.assertEqual(get_trimmed_sentences(relcl_doc, True, True, True, True), ["I met the man who owns the dog that bit me.", "I met the man who owns the dog that bit me.", "I met the man.", "I met the man who owns the dog that bit me."])
+
+
+	def test_trim_sentence(self):
+
+		self.assertEqual(trim_sentence(self.appos_doc, "appos"), "Obama spoke to reporters who waited.")
+		self.assertEqual(trim_sentence(self.duplicate_doc, "appos"), "the man left.")
+
+		# Test that the clean sentence is returned when the dependency is not found
+		self.assertEqual(trim_sentence(self.appos_doc, "acl"), "Obama, the president, spoke to reporters who waited.")
+
+
+	def test_trim_separate_clauses(self):
+
+		# "John, a farmer, met Mary, a teacher." with two appositives on either side of the verb
+		doc = Doc(self.vocab, words=["John", ",", "a", "farmer", ",", "met", "Mary", ",", "a", "teacher", "."],
+				  spaces=[False, True, True, False, True, True, False, True, True, False, False],
+				  heads=[5, 0, 3, 0, 0, 5, 5, 6, 9, 6, 5],
+				  deps=["nsubj", "punct", "det", "appos", "punct", "ROOT", "dobj", "punct", "det", "appos", "punct"])
+
+		# Test that each clause is removed on its own, keeping the words between them
+		self.assertEqual(trim_sentence(doc, "appos"), "John met Mary.")
+
+
+	def test_get_trimmed_sentences(self):
+
+		# Test that one call returns a trimmed sentence per enabled rule in appos, advcl, relcl, acl order
+		self.assertEqual(get_trimmed_sentences(self.appos_doc, True, False, True, True),
+						 ["Obama spoke to reporters who waited.", "Obama, the president, spoke to reporters.", "Obama, the president, spoke to reporters who waited."])
+		self.assertEqual(get_trimmed_sentences(self.appos_doc, False, False, False, False), [])
+
+
+	def test_get_annotated_variants(self):
+
+		annotated_list = get_annotated_variants(self.duplicate_doc, True, False, False, False)
+
+		# Test that the trimmed sentence keeps the tokens outside of the removed clause, without the commas cleaned out of its text
+		self.assertEqual([sentence for sentence, tagged_sent, lemmas in annotated_list], ["the man, the farmer, left.", "the man left."])
+		self.assertEqual([token for token, tag in annotated_list[1][1]], ["the", "man", "left", "."])
+		self.assertEqual(len(annotated_list[1][2]), 4)
+
+		# Test that the tokens of every variant spell out its text
+		for sentence, tagged_sent, lemmas in get_annotated_variants(self.appos_doc, True, False, True, False):
+			self.assertEqual("".join(token for token, tag in tagged_sent), sentence.replace(" ", ""))
+
+
+	def test_could_trim(self):
+
+		# Test that only cues of the enabled rules are looked for
+		self.assertTrue(could_trim("Obama, the president, spoke.", True, False, False, False))
+		self.assertFalse(could_trim("Obama spoke to reporters.", True, False, True, False))
+		self.assertTrue(could_trim("Obama spoke to reporters who waited.", False, False, True, False))
+		self.assertTrue(could_trim("Obama spoke after reporters waited.", False, True, False, False))
+		self.assertTrue(could_trim("Obama answered questions asked by reporters.", False, False, False, True))
+		self.assertFalse(could_trim("Obama answers questions.", False, True, True, True))
+
+		# Test that a comma alone is not a cue for adverbial clauses, nor a "to" before a noun or a word merely ending like a participle
+		self.assertFalse(could_trim("Obama spoke, he said.", False, True, False, False))
+		self.assertFalse(could_trim("Children and women have been waiting even then.", True, True, False, True))
+		self.assertFalse(could_trim("Obama was asked during the morning.", False, True, False, True))
+		self.assertFalse(could_trim("Obama answered questions.", False, False, False, True))
+
+		# Test the cues that depend on the neighbouring word
+		self.assertTrue(could_trim("Obama, President of the United States, spoke.", True, False, False, False))
+		self.assertTrue(could_trim("Speaking to reporters, Obama smiled.", False, True, False, False))
+		self.assertTrue(could_trim("Obama has plans to leave.", False, False, False, True))
+		self.assertTrue(could_trim("Obama met children born abroad.", False, False, False, True))
+
+
+	def test_prefilter_keeps_appositives(self):
+
+		# "Obama, President of the United States, spoke." with a title-led appositive
+		title_doc = Doc(self.vocab, words=["Obama", ",", "President", "of", "the", "United", "States", ",", "spoke", "."],
+						spaces=[False, True, True, True, True, True, False, True, False, False],
+						heads=[8, 0, 0, 2, 6, 6, 3, 0, 8, 8],
+						deps=["nsubj", "punct", "appos", "prep", "det", "compound", "pobj", "punct", "ROOT", "punct"])
+
+		# "The president, Barack Obama, spoke." with a proper-noun appositive
+		name_doc = Doc(self.vocab, words=["The", "president", ",", "Barack", "Obama", ",", "spoke", "."],
+					   spaces=[True, False, True, True, False, True, False, False],
+					   heads=[1, 6, 1, 4, 1, 1, 6, 6],
+					   deps=["det", "nsubj", "punct", "compound", "appos", "punct", "ROOT", "punct"])
+
+		parser = Doc_Parser([title_doc, name_doc, self.appos_doc, self.duplicate_doc])
+		sentences = [title_doc.text, name_doc.text, self.appos_doc.text, self.duplicate_doc.text]
+
+		# Test that the pre-filter parses every sentence with an appositive, so it does not change the trimmed sentences
+		for rules in [(True, False, False, False), (True, True, True, True)]:
+			self.assertEqual(get_compressed_sentences_batch(sentences, parser, False, False, False, *rules, prefilter=True),
+							 get_compressed_sentences_batch(sentences, parser, False, False, False, *rules))
+
+		self.assertEqual(get_compressed_sentences_batch(sentences[:2], parser, False, False, False, True, False, False, False, prefilter=True),
+						 [["Obama, President of the United States, spoke.", "Obama spoke."], ["The president, Barack Obama, spoke.", "The president spoke."]])
+
+
+	def test_prefilter_skips_parsing(self):
+
+		def parser_not_used(sentence):
+			raise AssertionError("parsed " + sentence)
+
+		parser_not_used.pipe = lambda sentences, batch_size: map(parser_not_used, sentences)
+
+		# Test that a sentence without cues is not parsed and is its own trimmed version for each rule
+		self.assertEqual(get_compressed_sentences_batch(["Obama answered questions.", ""], parser_not_used, False, False, False, True, False, True, False, prefilter=True),
+						 [["Obama answered questions.", "Obama answered questions.", "Obama answered questions."], [""]])
+
+
+	def test_batch_matches_single(self):
+
+		parser = Doc_Parser([self.appos_doc, self.duplicate_doc])
+		sentences = [self.appos_doc.text, "", self.duplicate_doc.text, "(AP)", self.appos_doc.text]
+
+		# Test that batched compression and annotation give each sentence what the per-sentence functions give it,
+		# for every single rule, all rules and no rules, with empty clean sentences kept in place
+		for rules in [(True, False, False, False), (False, True, False, False), (False, False, True, False), (False, False, False, True), (True, True, True, True), (False, False, False, False)]:
+			self.assertEqual(get_compressed_sentences_batch(sentences, parser, True, True, True, *rules),
+							 [get_compressed_sentences(sentence, parser, True, True, True, *rules) for sentence in sentences])
+			self.assertEqual(get_compressed_sentences_batch(sentences, parser, True, True, True, *rules, prefilter=True),
+							 [get_compressed_sentences(sentence, parser, True, True, True, *rules, prefilter=True) for sentence in sentences])
+			self.assertEqual(get_annotated_sentences_batch(sentences, parser, True, True, True, *rules),
+							 [get_annotated_sentences(sentence, parser, True, True, True, *rules) for sentence in sentences])
+
+
+	def test_clean_sentence(self):
 
-        # TODO: fix to actually test
-        value = 5
-        self.assertEqual(value, 5)
+		self.assertEqual(clean_sentence("\n  NEW YORK (AP) -- The  storm (a hurricane) hit.", True, True, True), "The storm hit.")
 
 
 if __name__ == '__main__':
-	unittest.main()
\ No newline at end of file
+	unittest.main()
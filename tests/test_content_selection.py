@@ -67,6 +67,19 @@ class TestContentSelection(unittest.TestCase):
 		self.assertTrue(np.array_equal(row_sums, one_vec))
 
 
+	def test_build_cos_sim_matrix(self):
+
+		# Test that the tf-idf matrix path gives the same matrix as comparing sentence dictionaries
+		sim_matrix_fast = content_selection._build_sim_matrix(self.sent_list, self.threshold, "cos", 0.6, 20, self.topic)
+
+		tf_idf_matrix = self.topic.tf_idf_matrix
+		self.topic.tf_idf_matrix = None
+		sim_matrix_slow = content_selection._build_sim_matrix(self.sent_list, self.threshold, "cos", 0.6, 20, self.topic)
+		self.topic.tf_idf_matrix = tf_idf_matrix
+
+		self.assertTrue(np.allclose(sim_matrix_fast, sim_matrix_slow))
+
+
 	def test_build_bias_vec(self):
 
 		# Test that when no sentences, returns an empty vector (size==0)
@@ -0,0 +1,276 @@
+#!opt/python-3.6/bin/python3
+# -*- coding: utf-8 -*-
+
+"""Unit tests for data_input.py"""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import unittest
+from unittest import mock
+import sys
+sys.path.append("../src")
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import data_input
+from data_input import Topic, Document, Sentence, reweight, build_pseudo_topic, build_topic, configure_class_objects, build_topic_in_worker, get_topic_worker_settings, get_worker_topic, get_data, set_parse_cache, get_gold_standard_docs
+from stem_table import Stem_Table
+from parse_cache import Parse_Cache
+from content_realization import get_compressed_sentences_batch
+from spacy.vocab import Vocab
+from spacy.tokens import Doc
+
+#### Stands in for the spaCy model, splitting sentences on spaces and giving each token its lemma from lemmas
+class Lemma_Parser:
+
+	def __init__(self, lemmas):
+		self.vocab = Vocab()
+		self.lemmas = lemmas
+
+	def pipe(self, sentences, batch_size=1000):
+		for sentence in sentences:
+			words = sentence.rstrip(".").split(" ") + ["."]
+			doc = Doc(self.vocab, words=words, spaces=[True] * (len(words) - 2) + [False, False])
+			for token in doc:
+				token.tag_ = "NNS" if token.text.endswith("s") else "VBD"
+				token.lemma_ = self.lemmas.get(token.lower_, token.lower_)
+			yield doc
+
+class TestDataInput(unittest.TestCase):
+
+	def setUp(self):
+		self.topic = build_pseudo_topic('pseudo_topic_content_selection.txt', idf_type="smooth_idf", tf_type="term_frequency")
+
+
+	def test_reweight(self):
+
+		smooth_idf = dict(self.topic.idf)
+		reweighted = reweight(self.topic, "standard_idf", "log_normalization")
+		built = build_pseudo_topic('pseudo_topic_content_selection.txt', idf_type="standard_idf", tf_type="log_normalization")
+		self.assertNotEqual(smooth_idf, built.idf)
+
+		# Test that reweighting a built topic gives the weights of a topic built with the new types
+		self.assertIs(reweighted, self.topic)
+		self.assertEqual(reweighted.idf, built.idf)
+		self.assertEqual(reweighted.tf_norm_values, built.tf_norm_values)
+		self.assertEqual(len(reweighted.matrix_sentences), len(built.matrix_sentences))
+		for sentence, built_sentence in zip(reweighted.matrix_sentences, built.matrix_sentences):
+			self.assertEqual(sentence.tf_idf, built_sentence.tf_idf)
+			self.assertEqual(sentence.tf_idf_norm, built_sentence.tf_idf_norm)
+
+		self.assertEqual(reweighted.vocabulary, built.vocabulary)
+		for matrix_name in ["raw_count_matrix", "tf_matrix", "tf_idf_matrix", "tf_idf_norm_matrix"]:
+			self.assertEqual((getattr(reweighted, matrix_name) != getattr(built, matrix_name)).nnz, 0, matrix_name)
+		self.assertEqual(list(reweighted.idf_vector), list(built.idf_vector))
+		self.assertEqual(list(reweighted.tf_vector), list(built.tf_vector))
+
+
+	def test_sentence_slots(self):
+
+		first_sentence, second_sentence, third_sentence = self.topic.document_list[0].sentence_list
+
+		# Test that sentences and their tokens keep no per-instance __dict__
+		for instance in [first_sentence] + first_sentence.token_list:
+			self.assertFalse(hasattr(instance, "__dict__"))
+			with self.assertRaises(AttributeError):
+				instance.token_count_cache = 1
+
+		# Test that the Tokens built on request hold the values the stored Token lists had before __slots__
+		self.assertEqual(sorted((token.token_value, token.raw_count, token.tf_norm) for token in first_sentence.token_list), [(".", 1, 0.2), ("1", 1, 0.2), ("This", 1, 0.2), ("sentence", 1, 0.2)])
+		self.assertEqual(sorted((token.token_value, token.raw_count, token.tf_norm) for token in third_sentence.token_list),
+						 [("!", 1, 1 / 6), ("3", 1, 1 / 6), ("Number", 1, 1 / 6), ("completely", 1, 1 / 6), ("different", 1, 1 / 6)])
+		self.assertAlmostEqual(second_sentence.tf_idf["2"], 0.8472978603872037)
+		self.assertAlmostEqual(second_sentence.tf_idf["sentence"], 0.3364722366212129)
+
+
+	def test_batched_tagging_matches_per_sentence(self):
+
+		sentences = ["Number 3 is completely different!", "This  is sentence\n1.", "Doc 1b sentence 2."]
+
+		# Test that one pos_tag_sents call tags every sentence of the document as tagging each one on its own did
+		with mock.patch.object(Document, "compress_sentences", return_value=[[sentence] for sentence in sentences]), \
+				mock.patch.object(data_input, "pos_tag_sents", wraps=data_input.pos_tag_sents) as pos_tag_sents:
+			document = Document(Topic(topic_id="D0901A"), doc_id="1c", document_text=" ".join(sentences))
+		pos_tag_sents.assert_called_once()
+		self.assertEqual(data_input.tag_sentences(sentences), [data_input.pos_tag(data_input.word_tokenize(Sentence.normalize(sentence))) for sentence in sentences])
+
+		reference_topic = Topic(topic_id="D0901A")
+		for sentence, text in zip(document.sentence_list, sentences):
+			reference = Sentence(reference_topic, text)
+			self.assertEqual(sentence.original_sentence, reference.original_sentence)
+			self.assertEqual(sentence.nouns, reference.nouns)
+			self.assertEqual(sentence.token_count, reference.token_count)
+			self.assertEqual(sentence.raw_counts, reference.raw_counts)
+			self.assertEqual(sentence.tf_norm_values, reference.tf_norm_values)
+		self.assertEqual(document.parent_topic.raw_counts, reference_topic.raw_counts)
+
+
+	def test_spacy_parser_loads_model_lazily(self):
+
+		# "Obama, the president, spoke to reporters who waited." with the appositive "the president" and relative clause "who waited"
+		doc = Doc(Vocab(), words=["Obama", ",", "the", "president", ",", "spoke", "to", "reporters", "who", "waited", "."],
+				  spaces=[False, True, True, False, True, True, True, True, True, False, False],
+				  heads=[5, 0, 3, 0, 0, 5, 5, 6, 9, 7, 5],
+				  deps=["nsubj", "punct", "det", "appos", "punct", "ROOT", "prep", "pobj", "nsubj", "relcl", "punct"])
+		sentences = [doc.text]
+
+		#### Stands in for the spaCy model, returning the hand-built parse
+		model = mock.Mock(side_effect=lambda sentence: doc)
+		model.pipe.side_effect = lambda sentences, batch_size=1000: [doc for sentence in sentences]
+
+		with mock.patch.object(data_input, "get_spacy_model", return_value=model) as get_spacy_model, \
+				mock.patch.object(data_input, "spacy_parse_memo", None), mock.patch.object(data_input, "spacy_parse_cache", None):
+
+			# Test that the model is not loaded when every remove_* clause flag is off
+			self.assertEqual(get_compressed_sentences_batch(sentences, data_input.spacy_parser, True, True, True, False, False, False, False),
+							 get_compressed_sentences_batch(sentences, model, True, True, True, False, False, False, False))
+			get_spacy_model.assert_not_called()
+
+			# Test that trimming through the lazy parser gives what passing the model itself gave
+			self.assertEqual(get_compressed_sentences_batch(sentences, data_input.spacy_parser, True, True, True, True, False, True, False),
+							 get_compressed_sentences_batch(sentences, model, True, True, True, True, False, True, False))
+			self.assertEqual(get_compressed_sentences_batch(sentences, data_input.spacy_parser, True, True, True, True, False, True, False),
+							 [[doc.text, "Obama spoke to reporters who waited.", "Obama, the president, spoke to reporters."]])
+			self.assertIs(data_input.spacy_parser(doc.text), doc)
+			get_spacy_model.assert_called()
+
+		cache_root = tempfile.mkdtemp()
+		try:
+			spacy_parse_cache = Parse_Cache(cache_root, "test_model")
+			spacy_parse_cache.put(doc.text, doc)
+
+			with mock.patch.object(data_input, "get_spacy_model", return_value=model) as get_spacy_model, \
+					mock.patch.object(data_input, "spacy_parse_memo", {}), mock.patch.object(data_input, "spacy_parse_cache", spacy_parse_cache):
+
+				# Test that the model is not loaded when every parse is in the cache or already parsed in this process
+				self.assertEqual(get_compressed_sentences_batch(sentences * 2, data_input.spacy_parser, True, True, True, True, False, True, False),
+								 get_compressed_sentences_batch(sentences * 2, model, True, True, True, True, False, True, False))
+				self.assertIs(data_input.spacy_parser(doc.text), doc)
+				get_spacy_model.assert_not_called()
+				self.assertEqual(spacy_parse_cache.stats()["hits"], 1)
+		finally:
+			shutil.rmtree(cache_root)
+
+
+	def test_add_compressed_variants(self):
+
+		reweight(self.topic, "standard_idf", "log_normalization")
+		first_doc, second_doc = self.topic.document_list[:2]
+		candidates = [first_doc.sentence_list[0], second_doc.sentence_list[1]]
+
+		# Stands in for the parse, giving the first candidate two variants and the second one
+		variants = [["This is 1.", "This sentence 1."], ["Doc 1b 2."]]
+		with mock.patch.object(Document, "trim_sentences", return_value=variants):
+			self.topic.add_compressed_variants(candidates)
+
+		# Test that variants follow their candidate and every sentence is renumbered in document order
+		self.assertEqual([sentence.original_sentence for sentence in first_doc.sentence_list[:4]], ["This is sentence 1.", "This is 1.", "This sentence 1.", "This is sentence 2."])
+		self.assertEqual([sentence.original_sentence for sentence in second_doc.sentence_list[1:3]], ["Doc 1b sentence 2.", "Doc 1b 2."])
+		for document in (first_doc, second_doc):
+			self.assertEqual([sentence.index for sentence in document.sentence_list], list(range(len(document.sentence_list))))
+
+		# Test that the weights are recomputed with the reweighted types, not the class level ones
+		self.assertEqual((self.topic.idf_type, self.topic.tf_type), ("standard_idf", "log_normalization"))
+		weights = [sentence.tf_idf_norm for sentence in self.topic.all_sentences() if sentence]
+		self.topic.compute_tf_idf("standard_idf", "log_normalization")
+		self.assertEqual(weights, [sentence.tf_idf_norm for sentence in self.topic.all_sentences() if sentence])
+
+
+	def test_annotated_sentences_stemmed_like_title(self):
+
+		configure_class_objects(False, False, None, None, False, False, False, False, False, False, False, spacy_annotation=True)
+		self.addCleanup(configure_class_objects, False, False, None, None, False, False, False, False, False, False, False)
+
+		with mock.patch.object(Sentence, "stemming", True), mock.patch.object(data_input, "spacy_parser", Lemma_Parser({"companies": "company", "merged": "merge"})):
+			topic = build_topic(("D0901A", "D0901A-A", "Companies merge", None, None), [("doc1", "20010101", None, None, "The companies merged.")])
+
+		# Test that a title and a document sentence tokenized by the spaCy parse give the same term for the same word
+		self.assertLessEqual(set(topic.title.raw_counts), set(topic.document_list[0].sentence_list[0].raw_counts))
+		self.assertEqual(topic.doc_freq[Sentence.stem_table.stem("companies")], 2)
+
+
+	def test_topic_worker_matches_serial(self):
+
+		topic_attributes = ("D0901A", "D0901A-A", "Storms hit the coast", "Describe the damage.", None)
+		doc_attributes = [("doc1", "20010101", "Storm damage", None, "Storms hit the coast on Monday. Officials reported damage to homes."),
+						  ("doc2", "20010102", None, None, "The damage was worse than officials reported.")]
+
+		with ProcessPoolExecutor(max_workers=1) as topic_pool, mock.patch.object(Sentence, "stem_table", Stem_Table()):
+			# The worker is started before the settings are made, so it only gets them with the task
+			topic_pool.submit(os.getpid).result()
+
+			with mock.patch.object(Sentence, "stemming", True), mock.patch.object(Document, "parse_batch_size", 7):
+				configure_class_objects(True, False, "standard_idf", "log_normalization", True, True, True, False, False, False, False)
+				worker_settings = get_topic_worker_settings()
+				worker_topic = get_worker_topic(topic_pool.submit(build_topic_in_worker, worker_settings, topic_attributes, doc_attributes))
+
+				# Test that the worker's stems are added to this process's table to be saved with it
+				self.assertEqual(Sentence.stem_table.stems["Storms"], "storm")
+				self.assertEqual(Sentence.stem_table.misses, 0)
+
+				serial_topic = build_topic(topic_attributes, doc_attributes)
+
+		# Test that the settings sent with the task include the parse batching
+		self.assertEqual(worker_settings[1], 7)
+
+		# Test that a topic built in a worker process is the topic built in this process
+		self.assertEqual([sentence.original_sentence for sentence in worker_topic.all_sentences() if sentence], [sentence.original_sentence for sentence in serial_topic.all_sentences() if sentence])
+		self.assertEqual([sentence.tf_idf_norm for sentence in worker_topic.all_sentences() if sentence], [sentence.tf_idf_norm for sentence in serial_topic.all_sentences() if sentence])
+		self.assertEqual(worker_topic.idf, serial_topic.idf)
+		self.assertEqual(worker_topic.doc_freq, serial_topic.doc_freq)
+		self.assertEqual((worker_topic.idf_type, worker_topic.tf_type), ("standard_idf", "log_normalization"))
+
+
+	def test_topic_cache_hit_sets_parse_cache(self):
+
+		tmp_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, tmp_dir)
+		self.addCleanup(set_parse_cache, None)
+		topic_cache_dir = os.path.join(tmp_dir, "topics")
+		parse_cache_dir = os.path.join(tmp_dir, "parses")
+
+		def get_topics(parse_batch_size):
+			return get_data(os.path.join(tmp_dir, "topics.xml"), False, False, "smooth_idf", "term_frequency", False, False, False, False, False, False, False,
+							topic_cache_dir=topic_cache_dir, parse_cache_dir=parse_cache_dir, parse_batch_size=parse_batch_size)
+
+		with mock.patch.object(data_input, "get_spacy_model_name", return_value="en_test-1.0.0"), mock.patch.object(Document, "parse_batch_size", 1000):
+			with mock.patch.object(data_input, "iter_data", return_value=iter([Topic(topic_id="D0901A")])):
+				get_topics(1000)
+
+			set_parse_cache(None)
+			with mock.patch.object(data_input, "iter_data", side_effect=AssertionError("topics rebuilt")):
+				topics = get_topics(7)
+
+			# Test that topics loaded from the topic cache still get the parse cache and parse batching for select_content
+			self.assertEqual([topic.topic_id for topic in topics], ["D0901A"])
+			self.assertEqual(data_input.spacy_parse_cache.cache_root, parse_cache_dir)
+			self.assertEqual(Document.parse_batch_size, 7)
+
+
+	def test_gold_standard_docs_compressed_with_compress_candidates(self):
+
+		gold_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, gold_dir)
+		with open(os.path.join(gold_dir, "D0901-A.M.100.A.A"), "w") as file:
+			file.write("Storms hit the coast. Officials reported damage.")
+
+		def get_gold_sentences(compress_candidates):
+			configure_class_objects(False, False, None, None, False, False, False, True, False, False, False, compress_candidates=compress_candidates)
+			return [sentence.original_sentence for doc in get_gold_standard_docs(gold_dir) for sentence in doc.sentence_list]
+
+		self.addCleanup(configure_class_objects, False, False, None, None, False, False, False, False, False, False, False)
+
+		with mock.patch.object(data_input, "spacy_parser", Lemma_Parser({})):
+			compressed = get_gold_sentences(0)
+
+			# Test that gold summaries get the same compressed variants with and without compress_candidates
+			self.assertEqual(get_gold_sentences(5), compressed)
+			self.assertEqual(Document.compress_candidates, 5)
+
+		self.assertEqual(len(compressed), 4)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,68 @@
+#!opt/python-3.6/bin/python3
+# -*- coding: utf-8 -*-
+
+"""Unit tests for doc_store.py"""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import unittest
+import os
+import shutil
+import tempfile
+import sys
+sys.path.append("../src")
+from doc_store import Doc_Store
+
+class TestDocStore(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.store_path = os.path.join(self.tmp_dir, "docs.sqlite")
+
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+
+
+	def test_put_and_get(self):
+
+		doc_store = Doc_Store(self.store_path)
+		doc_store.put("APW19980601.0001", "A headline", None, "CITY", "Some text.")
+
+		# Test that stored attributes come back in get_doc_attributes order and missing ids return None
+		self.assertEqual(doc_store.get("APW19980601.0001"), ("A headline", None, "CITY", "Some text."))
+		self.assertEqual(doc_store.get("APW19980601.0002"), None)
+		self.assertEqual((doc_store.hits, doc_store.misses), (1, 1))
+		doc_store.close()
+
+
+	def test_persists_between_runs(self):
+
+		doc_store = Doc_Store(self.store_path)
+		doc_store.put("APW_ENG_20050101.0001", None, None, None, "Text one.")
+		doc_store.put("APW_ENG_20050101.0002", None, None, None, "Text two.")
+		doc_store.close()
+
+		# Test that a new store on the same file sees the documents written by the first
+		doc_store = Doc_Store(self.store_path)
+		self.assertEqual(doc_store.stored_ids(["APW_ENG_20050101.0002", "APW_ENG_20050101.0003"]), {"APW_ENG_20050101.0002"})
+		self.assertEqual(doc_store.get("APW_ENG_20050101.0001")[3], "Text one.")
+		doc_store.close()
+
+
+	def test_commits_every_n_puts(self):
+
+		doc_store = Doc_Store(self.store_path, commit_every=2)
+		doc_store.put("APW_ENG_20050101.0001", None, None, None, "Text one.")
+		doc_store.put("APW_ENG_20050101.0002", None, None, None, "Text two.")
+		doc_store.put("APW_ENG_20050101.0003", None, None, None, "Text three.")
+
+		# Test that another connection sees the committed documents before the store is closed
+		reader = Doc_Store(self.store_path)
+		self.assertEqual(reader.stored_ids(["APW_ENG_20050101.0001", "APW_ENG_20050101.0002", "APW_ENG_20050101.0003"]), {"APW_ENG_20050101.0001", "APW_ENG_20050101.0002"})
+		reader.close()
+		doc_store.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
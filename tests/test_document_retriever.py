@@ -0,0 +1,388 @@
+#!opt/python-3.6/bin/python3
+# -*- coding: utf-8 -*-
+
+"""Unit tests for document_retriever.py"""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import unittest
+import gzip
+import os
+import random
+import shutil
+import tempfile
+import sys
+sys.path.append("../src")
+import document_retriever
+import synthetic_corpus
+from document_retriever import Document_Retriever
+
+acquaint_text = """<DOC>
+<DOCNO> APW19980601.0001 </DOCNO>
+<DOCTYPE> NEWS STORY </DOCTYPE>
+<BODY>
+<HEADLINE> First headline </HEADLINE>
+<TEXT>
+<P> First document text. </P>
+</TEXT>
+</BODY>
+</DOC>
+<DOC>
+<DOCNO> APW19980601.0002 </DOCNO>
+<BODY>
+<HEADLINE> Second headline </HEADLINE>
+<TEXT>
+<P> Second document text. </P>
+</TEXT>
+</BODY>
+</DOC>
+"""
+
+acquaint2_text = """<DOCSTREAM>
+<DOC id="APW_ENG_20050101.0001" type="story" >
+<HEADLINE>
+First headline
+</HEADLINE>
+<DATELINE>
+CITY, Jan. 1
+</DATELINE>
+<TEXT>
+<P>
+First document text.
+</P>
+</TEXT>
+</DOC>
+<DOC id="APW_ENG_20050101.0002" type="story" >
+<HEADLINE>
+Second headline
+</HEADLINE>
+<TEXT>
+<P>
+Second document text.
+</P>
+</TEXT>
+</DOC>
+</DOCSTREAM>
+"""
+
+gigaword_text = """<DOC id="APW_ENG_20070101.0001" type="story" >
+<HEADLINE>
+First headline
+</HEADLINE>
+<TEXT>
+<P>
+First document text.
+</P>
+</TEXT>
+</DOC>
+<DOC id="APW_ENG_20070101.0002" type="story" >
+<HEADLINE>
+Second headline
+</HEADLINE>
+<TEXT>
+<P>
+Second caf\xe9 text.
+</P>
+</TEXT>
+</DOC>
+"""
+
+
+class TestDocumentRetriever(unittest.TestCase):
+
+	def setUp(self):
+
+		# Write one small file in each corpus format
+		self.tmp_dir = tempfile.mkdtemp()
+
+		self.acquaint_path = os.path.join(self.tmp_dir, "19980601_APW_ENG")
+		with open(self.acquaint_path, 'w') as f:
+			f.write(acquaint_text)
+
+		self.acquaint2_path = os.path.join(self.tmp_dir, "apw_eng_200501.xml")
+		with open(self.acquaint2_path, 'w') as f:
+			f.write(acquaint2_text)
+
+		self.gigaword_path = os.path.join(self.tmp_dir, "apw_eng_200701.gz")
+		with gzip.open(self.gigaword_path, 'wt', encoding='latin-1') as f:
+			f.write(gigaword_text)
+
+		self.index_path = os.path.join(self.tmp_dir, "doc_index.json")
+
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+
+
+	def test_scan_doc_offsets(self):
+
+		# Test that every DOC in each format is found under its id
+		acquaint_offsets = document_retriever.scan_doc_offsets(self.acquaint_path)
+		self.assertEqual(sorted(acquaint_offsets), ["APW19980601.0001", "APW19980601.0002"])
+
+		gigaword_offsets = document_retriever.scan_doc_offsets(self.gigaword_path)
+		self.assertEqual(sorted(gigaword_offsets), ["APW_ENG_20070101.0001", "APW_ENG_20070101.0002"])
+
+		# Test that the offsets point at the DOC element itself
+		offset, length = document_retriever.scan_doc_offsets(self.acquaint2_path)["APW_ENG_20050101.0002"]
+		with open(self.acquaint2_path, 'rb') as f:
+			f.seek(offset)
+			fragment = f.read(length)
+		self.assertTrue(fragment.startswith(b'<DOC id="APW_ENG_20050101.0002"'))
+		self.assertTrue(fragment.endswith(b'</DOC>'))
+
+
+	def test_read_indexed_doc(self):
+
+		doc_ret = Document_Retriever(index_path=self.index_path)
+		doc_ret.build_index([self.acquaint_path, self.acquaint2_path, self.gigaword_path])
+
+		# Test that each format is parsed from its fragment with the right tags
+		doc_ret.configure("APW19980601.0002")
+		raw_doc = doc_ret.read_indexed_doc("APW19980601.0002")
+		self.assertEqual(raw_doc.find(doc_ret.headline_tag).text.strip(), "Second headline")
+
+		doc_ret.configure("APW_ENG_20050101.0001")
+		raw_doc = doc_ret.read_indexed_doc("APW_ENG_20050101.0001")
+		self.assertEqual(raw_doc.get("id"), "APW_ENG_20050101.0001")
+		self.assertEqual(raw_doc.find(doc_ret.dateline_tag).text.strip(), "CITY, Jan. 1")
+
+		doc_ret.configure("APW_ENG_20070101.0002")
+		raw_doc = doc_ret.read_indexed_doc("APW_ENG_20070101.0002")
+		self.assertEqual(raw_doc.find(doc_ret.text_tag).find("P").text.strip(), "Second caf\xe9 text.")
+
+
+	def test_gzip_reader(self):
+
+		# Random digits barely compress, so the file is read in several chunks. Two gzip members, so reads also cross from one member into the next
+		rng = random.Random(0)
+		data = "".join(str(rng.getrandbits(8)) for i in range(200000)).encode()
+		with open(self.gigaword_path, 'wb') as f:
+			f.write(gzip.compress(data[:150000]))
+			f.write(gzip.compress(data[150000:]))
+
+		reader = document_retriever.Gzip_Reader(self.gigaword_path, spacing=4096)
+		self.assertTrue(len(reader.points) > 3)
+
+		# Test that reads from any access point match the decompressed file, in any order
+		for offset, length in [(len(data) - 100, 100), (0, 10), (149990, 20), (123456, 50000), (4096, 1)]:
+			self.assertEqual(reader.read(offset, length), data[offset:offset + length])
+		reader.close()
+
+
+	def test_index_persists(self):
+
+		doc_ret = Document_Retriever(index_path=self.index_path)
+		doc_ret.build_index([self.acquaint2_path])
+
+		# Test that a new retriever loads the saved index instead of rescanning
+		reloaded = Document_Retriever(index_path=self.index_path)
+		self.assertIn(self.acquaint2_path, reloaded.indexed_files)
+		self.assertEqual(reloaded.doc_index, doc_ret.doc_index)
+
+
+	def test_stream_docs(self):
+
+		doc_ret = Document_Retriever(streaming=True)
+
+		# Test that only the requested documents are parsed and returned
+		doc_ret.configure("APW_ENG_20070101.0001")
+		docs = dict(doc_ret.stream_docs(self.gigaword_path, ["APW_ENG_20070101.0002", "missing"]))
+		self.assertEqual(list(docs), ["APW_ENG_20070101.0002"])
+		self.assertEqual(docs["APW_ENG_20070101.0002"].find(doc_ret.headline_tag).text.strip(), "Second headline")
+
+		doc_ret.configure("APW19980601.0001")
+		docs = dict(doc_ret.stream_docs(self.acquaint_path, ["APW19980601.0001", "APW19980601.0002"]))
+		self.assertEqual(docs["APW19980601.0001"].find("docno").text.strip(), "APW19980601.0001")
+		self.assertEqual(docs["APW19980601.0002"].find("docno").text.strip(), "APW19980601.0002")
+
+
+	def test_stream_doc(self):
+
+		doc_ret = Document_Retriever(streaming=True)
+		doc_ret.configure("APW_ENG_20070101.0002")
+		doc_ret.doc_path = self.gigaword_path
+
+		# Test that the scan records the documents it passes and stops at the requested one
+		raw_doc = doc_ret.stream_doc("APW_ENG_20070101.0002")
+		self.assertEqual(raw_doc.find(doc_ret.headline_tag).text.strip(), "Second headline")
+		self.assertEqual(doc_ret.doc_index["APW_ENG_20070101.0001"][0], self.gigaword_path)
+
+		# Test that a document the scan already passed is read by offset
+		raw_doc = doc_ret.stream_doc("APW_ENG_20070101.0001")
+		self.assertEqual(raw_doc.find(doc_ret.headline_tag).text.strip(), "First headline")
+		self.assertIn(self.gigaword_path, doc_ret.gzip_readers)
+
+		# Test that a missing document ends the scan and the file isn't scanned again
+		self.assertIsNone(doc_ret.stream_doc("APW_ENG_20070101.0003"))
+		self.assertIn(self.gigaword_path, doc_ret.indexed_files)
+		self.assertEqual(len(doc_ret.stream_scanners), 0)
+
+
+	def test_retrieve_docs(self):
+
+		doc_ret = Document_Retriever()
+		doc_ret.configure("APW_ENG_20070101.0001")
+		gigaword_path = doc_ret.doc_path
+
+		# Test that doc ids are grouped by corpus file without duplicates
+		grouped = doc_ret.group_doc_ids(["APW_ENG_20070101.0002", "APW_ENG_20050101.0001", "APW_ENG_20070101.0001", "APW_ENG_20070101.0002"])
+		self.assertEqual(len(grouped), 2)
+		self.assertEqual(grouped[gigaword_path], ["APW_ENG_20070101.0002", "APW_ENG_20070101.0001"])
+
+
+	def test_parse_file_doc_map(self):
+
+		doc_ret = Document_Retriever()
+
+		# Test that the doc map of each format has every DOC element under its id
+		doc_ret.configure("APW19980601.0001")
+		tree, doc_map = doc_ret.parse_file(self.acquaint_path)
+		self.assertEqual(sorted(doc_map), ["APW19980601.0001", "APW19980601.0002"])
+		self.assertIs(doc_map["APW19980601.0002"].getparent(), tree)
+
+		doc_ret.configure("APW_ENG_20050101.0001")
+		tree, doc_map = doc_ret.parse_file(self.acquaint2_path)
+		self.assertEqual(doc_map["APW_ENG_20050101.0002"].get("id"), "APW_ENG_20050101.0002")
+
+		doc_ret.configure("APW_ENG_20070101.0001")
+		tree, doc_map = doc_ret.parse_file(self.gigaword_path)
+		self.assertEqual(len(doc_map), len(tree.findall("DOC")))
+
+
+class TestSyntheticCorpus(unittest.TestCase):
+
+	def setUp(self):
+
+		# Write a small synthetic corpus laid out like /corpora/LDC
+		self.tmp_dir = tempfile.mkdtemp()
+		self.corpus_root = os.path.join(self.tmp_dir, "LDC")
+		self.topics_path = os.path.join(self.tmp_dir, "topics.xml")
+		synthetic_corpus.generate(self.corpus_root, self.topics_path, num_files=2, num_topics=3, docs_per_topic=6, sentences_per_doc=3, acquaint_docs=5, acquaint2_docs=5, gigaword_docs=5)
+
+		with open(self.topics_path) as f:
+			self.doc_ids = [line.split('"')[1] for line in f if line.startswith("<doc ")]
+
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+
+
+	def test_retrieval_modes_agree(self):
+
+		self.assertEqual(len(self.doc_ids), 18)
+
+		# Retrieve every document by whole-file parsing, streaming, the offset index and in batch
+		retrievers = [Document_Retriever(corpus_root=self.corpus_root),
+			Document_Retriever(corpus_root=self.corpus_root, streaming=True),
+			Document_Retriever(corpus_root=self.corpus_root, index_path=os.path.join(self.tmp_dir, "doc_index.json"))]
+		retrieved = [[doc_ret.retrieve_doc(doc_id) for doc_id in self.doc_ids] for doc_ret in retrievers]
+
+		batch = Document_Retriever(corpus_root=self.corpus_root).retrieve_docs(self.doc_ids)
+		retrieved.append([batch[doc_id] for doc_id in self.doc_ids])
+
+		# Test that every mode finds the same headline for each document
+		doc_ret = Document_Retriever(corpus_root=self.corpus_root)
+		for i, doc_id in enumerate(self.doc_ids):
+			doc_ret.configure(doc_id)
+			headlines = set(raw_docs[i].find(doc_ret.headline_tag).text.strip() for raw_docs in retrieved)
+			self.assertEqual(len(headlines), 1, doc_id)
+
+		# Test that streaming parses much less than whole files
+		self.assertTrue(retrievers[1].bytes_parsed < retrievers[0].bytes_parsed)
+
+
+	def test_prefetch_with_index(self):
+
+		index_path = os.path.join(self.tmp_dir, "doc_index.json")
+		topic_doc_ids = [self.doc_ids[:6], self.doc_ids[6:12], self.doc_ids[12:]]
+		prefetcher = document_retriever.Doc_Prefetcher(topic_doc_ids, max_workers=3, corpus_root=self.corpus_root, index_path=index_path)
+		num_docs = sum(len(prefetcher.get_topic_docs(topic_index)) for topic_index in range(len(topic_doc_ids)))
+		prefetcher.shutdown()
+
+		# Test that the workers read through the index and every file they scanned ends up in the saved index
+		self.assertEqual(num_docs, len(self.doc_ids))
+		self.assertEqual(Document_Retriever(index_path=index_path).indexed_files, set(prefetcher.doc_ids_by_path))
+
+
+class TestTreeCache(unittest.TestCase):
+
+	def test_entry_budget(self):
+
+		cache = document_retriever.Tree_Cache(max_entries=2)
+		cache.put("a", "tree_a")
+		cache.put("b", "tree_b")
+
+		# Test that getting "a" makes "b" the least recently used and evicts it
+		self.assertEqual(cache.get("a"), "tree_a")
+		cache.put("c", "tree_c")
+		self.assertNotIn("b", cache)
+		self.assertIn("a", cache)
+		self.assertEqual(cache.get("b"), None)
+		self.assertEqual(cache.stats(), {"entries": 2, "bytes": 0, "hits": 1, "misses": 1, "evictions": 1})
+
+	def test_byte_budget(self):
+
+		cache = document_retriever.Tree_Cache(max_bytes=100)
+		cache.put("a", "tree_a", 60)
+		cache.put("b", "tree_b", 30)
+		self.assertEqual(len(cache), 2)
+
+		# Test that trees are evicted until the new total fits the budget
+		cache.put("c", "tree_c", 50)
+		self.assertEqual(list(cache.entries), ["b", "c"])
+		self.assertEqual(cache.total_bytes, 80)
+
+		# Test that a single tree larger than the budget is still kept
+		cache.put("d", "tree_d", 500)
+		self.assertEqual(list(cache.entries), ["d"])
+		self.assertEqual(cache.evictions, 3)
+
+
+class TestDocPrefetcher(unittest.TestCase):
+
+	def make_prefetcher(self, topic_doc_ids, lookahead):
+
+		prefetcher = document_retriever.Doc_Prefetcher(topic_doc_ids, max_workers=2, lookahead=lookahead)
+
+		# Replace file reading with one that records which documents of which files are read
+		prefetcher.reads = []
+		def retrieve_file(doc_path, doc_ids):
+			prefetcher.reads.append((doc_path, doc_ids))
+			return {doc_id: doc_id.lower() for doc_id in doc_ids}
+		prefetcher.retrieve_file = retrieve_file
+
+		return prefetcher
+
+	def test_get_topic_docs(self):
+
+		# Two topics share the Gigaword month file, the second also needs an Acquaint2 file
+		topic_doc_ids = [["APW_ENG_20070101.0001"], ["APW_ENG_20070101.0002", "APW_ENG_20050101.0001"]]
+		prefetcher = self.make_prefetcher(topic_doc_ids, 1)
+
+		# Test that each topic only gets its own documents and the shared file is read once for both topics
+		self.assertEqual(prefetcher.get_topic_docs(0), {"APW_ENG_20070101.0001": "apw_eng_20070101.0001"})
+		self.assertEqual(prefetcher.get_topic_docs(1), {"APW_ENG_20070101.0002": "apw_eng_20070101.0002", "APW_ENG_20050101.0001": "apw_eng_20050101.0001"})
+		prefetcher.shutdown()
+
+		self.assertEqual(sorted(len(doc_ids) for doc_path, doc_ids in prefetcher.reads), [1, 2])
+		self.assertEqual(prefetcher.futures, {})
+
+	def test_reads_released_after_topic(self):
+
+		# The first and last of five topics share a file, the others each use their own
+		topic_doc_ids = [["APW_ENG_20070101.0001"], ["APW_ENG_20050101.0001"], ["APW_ENG_20050201.0001"], ["APW_ENG_20050301.0001"], ["APW_ENG_20070101.0002"]]
+		prefetcher = self.make_prefetcher(topic_doc_ids, 1)
+
+		# Test that no read is held for a topic once it has its documents, so at most the lookahead window is held
+		for topic_index, doc_ids in enumerate(topic_doc_ids):
+			self.assertEqual(list(prefetcher.get_topic_docs(topic_index)), doc_ids)
+			self.assertTrue(all(index > topic_index for index, doc_path in prefetcher.futures))
+			self.assertLessEqual(len(prefetcher.futures), 1)
+		prefetcher.shutdown()
+
+		# Test that the shared file is read again for the last topic instead of being held from the first
+		self.assertEqual([doc_ids for doc_path, doc_ids in prefetcher.reads if "200701" in doc_path], [["APW_ENG_20070101.0001"], ["APW_ENG_20070101.0002"]])
+
+
+if __name__ == '__main__':
+	unittest.main()
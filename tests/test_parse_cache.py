@@ -0,0 +1,102 @@
+#!opt/python-3.6/bin/python3
+# -*- coding: utf-8 -*-
+
+"""Unit tests for parse_cache.py"""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import unittest
+from unittest import mock
+import os
+import shutil
+import tempfile
+import sys
+sys.path.append("../src")
+from parse_cache import Parse_Cache
+from spacy.vocab import Vocab
+from spacy.tokens import Doc
+
+#### Stands in for the spaCy model, attaching every token to the first and counting the sentences it parses
+class Counting_Parser:
+
+	def __init__(self):
+		self.vocab = Vocab()
+		self.parsed = 0
+
+	def pipe(self, sentences, batch_size=1000):
+		for sentence in sentences:
+			self.parsed += 1
+			words = sentence.split(" ")
+			yield Doc(self.vocab, words=words, spaces=[True] * (len(words) - 1) + [False], heads=[0] * len(words), deps=["ROOT"] + ["dep"] * (len(words) - 1))
+
+class TestParseCache(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.parser = Counting_Parser()
+
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+
+
+	def test_pipe_parses_misses_only(self):
+
+		parse_cache = Parse_Cache(self.tmp_dir, "en_test-1.0.0")
+		sentences = ["Storms hit the coast .", "Officials reported damage .", "Storms hit the coast ."]
+
+		# Test that a repeated sentence is parsed once and the parses come back in input order
+		docs = parse_cache.pipe(sentences, lambda: self.parser)
+		self.assertEqual([doc.text for doc in docs], sentences)
+		self.assertEqual(self.parser.parsed, 2)
+		self.assertEqual(len(parse_cache), 2)
+
+		# Test that cached sentences don't load the model
+		docs = parse_cache.pipe(sentences[:2], lambda: None)
+		self.assertEqual((parse_cache.hits, parse_cache.misses), (2, 3))
+
+
+	def test_persists_between_runs(self):
+
+		parse_cache = Parse_Cache(self.tmp_dir, "en_test-1.0.0")
+		parse_cache.pipe(["Storms hit the coast ."], lambda: self.parser)
+		parse_cache.save()
+
+		# Test that a new cache on the same directory reads the saved parse with its tree
+		parse_cache = Parse_Cache(self.tmp_dir, "en_test-1.0.0")
+		doc = parse_cache.get("Storms hit the coast .")
+		self.assertEqual([token.dep_ for token in doc], ["ROOT", "dep", "dep", "dep", "dep"])
+		self.assertEqual([token.head.i for token in doc], [0, 0, 0, 0, 0])
+		self.assertEqual(parse_cache.stats(), {"entries": 1, "hits": 1, "misses": 0, "hit_rate": 1.0})
+
+		# Test that parses of another model version are kept apart
+		self.assertEqual(len(Parse_Cache(self.tmp_dir, "en_test-2.0.0")), 0)
+		self.assertEqual(os.listdir(self.tmp_dir).count("en_test-1.0.0"), 1)
+
+
+	def test_stores_parse_without_docbin(self):
+
+		doc = Doc(self.parser.vocab, words=["Storms", "hit", "the", "coast", "."], spaces=[True, True, True, False, False],
+				  heads=[1, 1, 3, 1, 1], deps=["nsubj", "ROOT", "det", "dobj", "punct"])
+		for token, tag, pos, lemma in zip(doc, ["NNS", "VBD", "DT", "NN", "."], ["NOUN", "VERB", "DET", "NOUN", "PUNCT"], ["storm", "hit", "the", "coast", "."]):
+			token.tag_ = tag
+			token.pos_ = pos
+			token.lemma_ = lemma
+
+		# Test that a parse saved and loaded while spaCy has no DocBin (before 2.2) keeps everything compression uses
+		with mock.patch("spacy.tokens.DocBin", None):
+			parse_cache = Parse_Cache(self.tmp_dir, "en_core_web_md-2.1.0")
+			parse_cache.put(doc.text, doc)
+			parse_cache.save()
+
+			cached_doc = Parse_Cache(self.tmp_dir, "en_core_web_md-2.1.0").get(doc.text)
+
+		self.assertEqual(cached_doc.text, doc.text)
+		for attr in ["text", "whitespace_", "tag_", "pos_", "lemma_", "dep_", "idx"]:
+			self.assertEqual([getattr(token, attr) for token in cached_doc], [getattr(token, attr) for token in doc], attr)
+		self.assertEqual([token.head.i for token in cached_doc], [1, 1, 3, 1, 1])
+		self.assertEqual([subtree_token.i for subtree_token in cached_doc[3].subtree], [2, 3])
+
+
+if __name__ == '__main__':
+	unittest.main()
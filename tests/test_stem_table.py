@@ -0,0 +1,73 @@
+#!opt/python-3.6/bin/python3
+# -*- coding: utf-8 -*-
+
+"""Unit tests for stem_table.py"""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import unittest
+import os
+import shutil
+import tempfile
+import sys
+sys.path.append("../src")
+from stem_table import Stem_Table
+from nltk import PorterStemmer
+
+class TestStemTable(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.table_path = os.path.join(self.tmp_dir, "stems.json")
+
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+
+
+	def test_stem_matches_porter_stemmer(self):
+
+		stem_table = Stem_Table()
+		ps = PorterStemmer()
+
+		# Test that memoized stems equal the stemmer output and repeated tokens are hits
+		for token in ["Officials", "reported", "storms", "reported", "Officials"]:
+			self.assertEqual(stem_table.stem(token), ps.stem(token))
+		self.assertEqual((stem_table.hits, stem_table.misses), (2, 3))
+		self.assertEqual(stem_table.hit_rate(), 0.4)
+
+
+	def test_persists_between_runs(self):
+
+		stem_table = Stem_Table(self.table_path)
+		stem_table.stem("flooded")
+		stem_table.save()
+
+		# Test that a new table on the same file starts with the saved stems
+		stem_table = Stem_Table(self.table_path)
+		self.assertEqual(len(stem_table), 1)
+		stem_table.stem("flooded")
+		self.assertEqual(stem_table.stats()["hits"], 1)
+
+
+	def test_new_stems_merge_into_saved_table(self):
+
+		worker_table = Stem_Table()
+		worker_table.stem("flooded")
+		worker_table.track_new_stems()
+		worker_table.stem("storms")
+		worker_table.stem("flooded")
+
+		# Test that only stems added after tracking started are returned, once
+		self.assertEqual(worker_table.pop_new_stems(), {"storms": "storm"})
+		self.assertEqual(worker_table.pop_new_stems(), {})
+
+		# Test that merged stems are saved with the table
+		stem_table = Stem_Table(self.table_path)
+		stem_table.update({"storms": "storm"})
+		stem_table.save()
+		self.assertEqual(Stem_Table(self.table_path).stems, {"storms": "storm"})
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,53 @@
+#!opt/python-3.6/bin/python3
+# -*- coding: utf-8 -*-
+
+"""Unit tests for text_summarizer.py"""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import unittest
+from unittest import mock
+import sys
+sys.path.append("../src")
+import text_summarizer
+from data_input import Topic, Document, configure_class_objects
+
+class TestTextSummarizer(unittest.TestCase):
+
+	def test_stream_with_entity_ordering(self):
+
+		# Stands in for iter_data, which only sets the preprocessing settings once its first topic is pulled
+		def iter_topics(*args, **kwargs):
+			configure_class_objects(False, False, None, None, True, True, False, False, False, False, False)
+			yield Topic(topic_id="D0901A")
+			yield Topic(topic_id="D0902A")
+
+		model_settings = []
+		ordered_topics = []
+
+		def build_entity_model(output_folder, num_permutations):
+			model_settings.append((Document.remove_header, Document.remove_parens))
+
+		def order_info_entity(topics, num_permutations, output_folder, build_model=True):
+			self.assertFalse(build_model)
+			ordered_topics.extend(topic.topic_id for topic in topics)
+			return topics
+
+		with mock.patch.object(Document, "remove_header", False, create=True), mock.patch.object(Document, "remove_parens", False, create=True), \
+				mock.patch.object(text_summarizer, "iter_data", iter_topics), \
+				mock.patch.object(text_summarizer, "build_entity_model", build_entity_model), \
+				mock.patch.object(text_summarizer, "order_info_entity", order_info_entity), \
+				mock.patch.object(text_summarizer, "select_content", lambda topics, *args: topics), \
+				mock.patch.object(text_summarizer, "write_summary_files"), mock.patch.object(text_summarizer, "eval_summary"):
+
+			text_summarizer.summarize_text("topics.xml", "test", "dev", False, False, "smooth_idf", "term_frequency", 0.7, 0.0, 0.5, 0.1, 0.5, 20, 5, False, "cos", "cos", "entity", 2,
+										   True, True, False, False, False, False, False, stream_batch_size=1)
+
+		# Test that the entity model is built once, with the settings of the run, and every batch is ordered with it
+		self.assertEqual(model_settings, [(True, True)])
+		self.assertEqual(ordered_topics, ["D0901A", "D0902A"])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,56 @@
+#!opt/python-3.6/bin/python3
+# -*- coding: utf-8 -*-
+
+"""Unit tests for topic_cache.py"""
+
+__author__ = "Benny Longwill"
+__email__ = "longwill@uw.edu"
+
+import unittest
+import os
+import shutil
+import tempfile
+import sys
+sys.path.append("../src")
+from topic_cache import Topic_Cache
+
+class TestTopicCache(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.topics_path = os.path.join(self.tmp_dir, "topics.xml")
+		with open(self.topics_path, 'w') as file:
+			file.write("<TACtaskdata>\n</TACtaskdata>\n")
+
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+
+
+	def test_make_key(self):
+
+		settings = (True, False, "smooth_idf", "term_frequency")
+		key = Topic_Cache.make_key([self.topics_path], settings)
+
+		# Test that the key is stable and changes with the settings and with the file contents
+		self.assertEqual(Topic_Cache.make_key([self.topics_path], settings), key)
+		self.assertNotEqual(Topic_Cache.make_key([self.topics_path], (False, False, "smooth_idf", "term_frequency")), key)
+
+		with open(self.topics_path, 'a') as file:
+			file.write("\n")
+		self.assertNotEqual(Topic_Cache.make_key([self.topics_path], settings), key)
+
+
+	def test_put_and_get(self):
+
+		topic_cache = Topic_Cache(os.path.join(self.tmp_dir, "cache"))
+		key = Topic_Cache.make_key([self.topics_path], ())
+
+		# Test that a missing key returns None and a stored list comes back equal
+		self.assertEqual(topic_cache.get(key), None)
+		topic_cache.put(key, [{"topic_id": "D1001A"}])
+		self.assertEqual(topic_cache.get(key), [{"topic_id": "D1001A"}])
+		self.assertEqual((topic_cache.hits, topic_cache.misses), (1, 1))
+
+
+if __name__ == '__main__':
+	unittest.main()